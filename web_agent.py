@@ -1,10 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import os
+import re
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -21,6 +23,28 @@ from database_config_supabase import (
     update_user_login_supabase
 )
 
+# Optional JIT compiler for the quarterly aggregation on very large portfolios
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional multi-threaded groupby for the sector/channel sums on large portfolios
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+
+# Optional multi-threaded CSV parser for uploaded transaction files
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Password hashing - temporarily disabled due to login_system.py issues
 # from login_system import hash_password, verify_password
 
@@ -35,6 +59,691 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Portfolio columns narrowed once at load time so every groupby/sum/sort
+# on the pages moves fewer bytes
+PORTFOLIO_NUMERIC_COLUMNS = [
+    'invested_amount', 'current_value', 'unrealized_pnl', 'pnl_percentage',
+    'quantity', 'price', 'live_price'
+]
+PORTFOLIO_CATEGORICAL_COLUMNS = ['ticker', 'sector', 'channel', 'transaction_type']
+
+# Downloadable sample transactions file; invariant, so kept as bytes instead of
+# rebuilding and serializing a DataFrame on every rerun
+SAMPLE_CSV = (
+    "date,ticker,quantity,transaction_type,price,stock_name,sector,channel\n"
+    "2024-01-15,RELIANCE,100,buy,2500.5,Reliance Industries,Oil & Gas,Direct\n"
+    "2024-01-20,120828,500,buy,45.25,ICICI Prudential Technology Fund,Technology,Online\n"
+    "2024-02-01,TCS,50,sell,3800.0,Tata Consultancy Services,Technology,Broker\n"
+).encode()
+
+# NSE/BSE suffix stripped when matching the same stock across exchanges
+EXCHANGE_SUFFIX_RE = re.compile(r'\.(NS|BO)$')
+
+# Market cap categories in Crores, each bin includes its lower edge
+MARKET_CAP_BINS = [-np.inf, 500, 5000, 20000, np.inf]
+MARKET_CAP_LABELS = [
+    'Micro Cap (<₹500 Cr)', 'Small Cap (₹500-4,999 Cr)',
+    'Mid Cap (₹5,000-19,999 Cr)', 'Large Cap (₹20,000+ Cr)'
+]
+
+# Summary metric label for each market cap category, largest first
+MARKET_CAP_METRICS = list(zip(['Large Cap', 'Mid Cap', 'Small Cap', 'Micro Cap'], reversed(MARKET_CAP_LABELS)))
+
+# Concurrent live price/sector fetches; each one is a network round trip
+PRICE_FETCH_WORKERS = 16
+
+# Developer progress messages are shown only when WMS_DEBUG is set
+DEBUG = bool(os.environ.get('WMS_DEBUG'))
+
+# Server-side diagnostics; tracebacks go here instead of into the page
+logger = logging.getLogger(__name__)
+
+def debug_info(message, *args):
+    """Show a developer progress message; formatted and sent only in debug mode"""
+    if DEBUG:
+        st.info(message % args)
+
+def fetch_ticker_data(ticker, user_id):
+    """Live price, sector and market cap for one ticker, or the error that stopped the fetch.
+    
+    Runs on a worker thread, so it reports through its return value instead of st.* calls.
+    """
+    try:
+        # Only stocks have a market cap
+        market_cap = None
+        
+        if str(ticker).isdigit() or ticker.startswith('MF_'):
+            # Mutual fund - use numerical scheme code and get fund category from mftool
+            from unified_price_fetcher import get_mutual_fund_price_and_category
+            live_price, fund_category = get_mutual_fund_price_and_category(ticker, ticker, user_id, None)
+            
+            # Use fund category from mftool if available, otherwise default to "Mutual Fund"
+            if fund_category and fund_category != 'Unknown':
+                sector = fund_category
+                logger.debug("MF %s: using fund category '%s' from mftool", ticker, sector)
+            else:
+                sector = "Mutual Fund"  # Fallback if no category available
+                logger.debug("MF %s: no fund category available, using default 'Mutual Fund'", ticker)
+        else:
+            # Stock - fetch price, sector, and market cap from yfinance
+            from unified_price_fetcher import get_stock_price_and_sector
+            live_price, sector, market_cap = get_stock_price_and_sector(ticker, ticker, None)
+            
+            # If no sector from yfinance, try to get it from stock data table
+            if not sector or sector == 'Unknown':
+                stock_data = get_stock_data_supabase(ticker)
+                sector = stock_data.get('sector', None) if stock_data else None
+                
+                # If still no sector, try to fetch it from stock_data_agent
+                if not sector or sector == 'Unknown':
+                    try:
+                        from stock_data_agent import get_sector
+                        sector = get_sector(ticker)
+                        # Update the stock_data table with the sector; tickers without a
+                        # stock_data row keep the sector for this fetch only
+                        if sector and sector != 'Unknown' and stock_data:
+                            try:
+                                update_stock_data_supabase(ticker, sector=sector)
+                            except Exception as e:
+                                logger.warning("Could not update sector for %s: %s", ticker, e)
+                    except Exception as e:
+                        logger.warning("Could not fetch sector for %s: %s", ticker, e)
+                        sector = 'Unknown'
+            
+            # If still no sector, use a more intelligent categorization
+            if not sector or sector == 'Unknown':
+                # Try to categorize based on ticker name patterns
+                ticker_upper = ticker.upper()
+                if any(word in ticker_upper for word in ['BANK', 'HDFC', 'ICICI', 'SBI', 'AXIS', 'KOTAK']):
+                    sector = 'Banking'
+                elif any(word in ticker_upper for word in ['TECH', 'INFY', 'TCS', 'WIPRO', 'HCL']):
+                    sector = 'Technology'
+                elif any(word in ticker_upper for word in ['PHARMA', 'CIPLA', 'DRREDDY', 'SUNPHARMA']):
+                    sector = 'Pharmaceuticals'
+                elif any(word in ticker_upper for word in ['AUTO', 'MARUTI', 'TATAMOTORS', 'BAJAJ']):
+                    sector = 'Automobile'
+                elif any(word in ticker_upper for word in ['STEEL', 'TATASTEEL', 'JSWSTEEL']):
+                    sector = 'Metals & Mining'
+                elif any(word in ticker_upper for word in ['OIL', 'ONGC', 'COAL']):
+                    sector = 'Oil & Gas'
+                elif any(word in ticker_upper for word in ['CONSUMER', 'HINDUNILVR', 'ITC', 'NESTLE']):
+                    sector = 'Consumer Goods'
+                elif any(word in ticker_upper for word in ['REALTY', 'DLF', 'GODREJ']):
+                    sector = 'Real Estate'
+                elif any(word in ticker_upper for word in ['POWER', 'POWERGRID', 'NTPC']):
+                    sector = 'Power & Energy'
+                else:
+                    sector = 'Other Stocks'
+        
+        return {'ticker': ticker, 'live_price': live_price, 'sector': sector, 'market_cap': market_cap}
+    except Exception as e:
+        return {'ticker': ticker, 'error': e}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def session_duration_hours(login_iso):
+    """Hours since the ISO login time as display text, recomputed at most once a minute"""
+    return f"{(datetime.now() - datetime.fromisoformat(login_iso)).total_seconds() / 3600:.1f}"
+
+# Upload CSV headers and the transaction column each one maps to
+UPLOAD_COLUMN_MAPPING = {
+    'Stock Name': 'stock_name',
+    'Stock_Name': 'stock_name',
+    'stock_name': 'stock_name',
+    'Ticker': 'ticker',
+    'ticker': 'ticker',
+    'Quantity': 'quantity',
+    'quantity': 'quantity',
+    'Price': 'price',
+    'price': 'price',
+    'Transaction Type': 'transaction_type',
+    'Transaction_Type': 'transaction_type',
+    'transaction_type': 'transaction_type',
+    'Date': 'date',
+    'date': 'date',
+    'Channel': 'channel',
+    'channel': 'channel',
+    'Sector': 'sector',
+    'sector': 'sector'
+}
+
+def read_uploaded_csv(uploaded_file):
+    """Parse an uploaded CSV into a DataFrame, with pyarrow's reader when it is installed"""
+    # getvalue() returns the whole upload whatever the current read position is
+    data = uploaded_file.getvalue()
+    if not PYARROW_AVAILABLE:
+        return pd.read_csv(io.BytesIO(data))
+    
+    # Empty cells become nulls, as pandas would read them, so the dropna checks still apply
+    table = pv.read_csv(
+        pa.py_buffer(data),
+        parse_options=pv.ParseOptions(delimiter=','),
+        convert_options=pv.ConvertOptions(strings_can_be_null=True)
+    )
+    return table.to_pandas()
+
+def shrink_portfolio(df):
+    """Downcast numeric columns and convert low-cardinality text columns to categoricals"""
+    for col in PORTFOLIO_NUMERIC_COLUMNS:
+        if col in df.columns:
+            downcast = 'integer' if pd.api.types.is_integer_dtype(df[col]) else 'float'
+            df[col] = pd.to_numeric(df[col], errors='coerce', downcast=downcast)
+
+    for col in PORTFOLIO_CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(pd.CategoricalDtype())
+
+    # Transaction dates carry no time component, second resolution is plenty
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        if hasattr(df['date'].dt, 'as_unit'):
+            df['date'] = df['date'].dt.as_unit('s')
+
+    return df
+
+def safe_percent(numerator, denominator, where=None):
+    """Return numerator / denominator * 100, 0 wherever `where` is False (default: denominator != 0)"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    if where is None:
+        where = denominator != 0
+    # Only the unmasked elements are divided, so no inf/NaN is produced and no warning raised
+    ratio = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=ratio, where=where)
+    return ratio * 100.0
+
+def pnl_percentage(frame):
+    """Return % P&L for each row of frame, 0 where nothing was invested"""
+    return safe_percent(frame['unrealized_pnl'], frame['invested_amount'])
+
+# Bound str.format methods for the display columns; mapped over whole columns
+# instead of evaluating an f-string per row
+format_money = '₹{:,.2f}'.format
+format_pct = '{:.2f}%'.format
+format_count = '{:,.0f}'.format
+format_rupees = '₹{:,.0f}'.format
+
+# Display formats for the numeric best stock columns
+BEST_STOCK_FORMATS = {
+    'Return %': format_pct,
+    'Invested Amount': format_money,
+    'Current Value': format_money,
+    'P&L': format_money
+}
+
+# Display formats for the numeric market cap breakdown columns; a Styler keeps the
+# thousands separators that Streamlit's printf column formats cannot produce
+MARKET_CAP_FORMATS = {
+    'Market Cap (Cr)': format_rupees,
+    'Portfolio Value': format_rupees,
+    'Invested Amount': format_rupees,
+    'Total Quantity': format_count
+}
+
+# Display formats and headers for the numeric combined sector-channel P&L table
+COMBINED_PNL_FORMATS = {
+    'unrealized_pnl': format_money,
+    'percentage': format_pct
+}
+COMBINED_PNL_COLUMN_CONFIG = {
+    'unrealized_pnl': 'P&L',
+    'percentage': 'Percentage'
+}
+
+def return_colors(returns):
+    """Map % returns to table cell CSS: green >= 20, yellow >= 10, red otherwise"""
+    returns = np.asarray(returns, dtype=float)
+    return np.select(
+        [returns >= 20, returns >= 10],
+        ['background-color: #d4edda; color: #155724;',   # Green for excellent
+         'background-color: #fff3cd; color: #856404;'],  # Yellow for good
+        default='background-color: #f8d7da; color: #721c24;'  # Red for fair and below
+    )
+
+# Fragments rerun only their own block; fall back to the experimental name
+# on older Streamlit and to a plain call where neither exists
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+# Summary bar charts are read-only: no mode bar, and a fixed uirevision so
+# reruns update the data without resetting the view
+SUMMARY_CHART_CONFIG = {'displayModeBar': False}
+
+QUARTERLY_SUM_COLUMNS = ['invested_amount', 'current_value', 'unrealized_pnl']
+
+# Scatter charts with more points than this are drawn with WebGL (scattergl)
+# instead of one SVG node per point; bar charts have no WebGL trace and stay SVG
+WEBGL_MIN_POINTS = 50
+
+# Unified x hover re-scans every trace on each mouse move; above this many
+# points the timeline falls back to closest-point hover
+UNIFIED_HOVER_MAX_POINTS = 5000
+
+# Bar charts show at most this many bars; the smallest are summed into 'Other'
+MAX_BAR_CATEGORIES = 50
+
+# The P&L scatter's plotted and hover columns, the only ones serialized to the browser
+PNL_SCATTER_COLUMNS = [
+    'ticker', 'invested_amount', 'unrealized_pnl', 'current_value', 'pnl_percentage', 'status'
+]
+
+# Below this many rows the pandas groupby is faster than paying for the JIT compile
+NUMBA_MIN_ROWS = 1_000_000
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _scatter_group_sums(group_ids, values, n_groups):
+        """Add every row of values into its group's row of the output, skipping NaNs"""
+        out = np.zeros((n_groups, values.shape[1]))
+        for i in range(group_ids.size):
+            g = group_ids[i]
+            for j in range(values.shape[1]):
+                v = values[i, j]
+                if v == v:
+                    out[g, j] += v
+        return out
+    
+    @njit(cache=True)
+    def _group_argmax(group_codes, values, n_groups):
+        """Row position of the largest value in each group (first on ties), -1 if none"""
+        best = np.full(n_groups, -1, np.int64)
+        for i in range(group_codes.size):
+            g = group_codes[i]
+            v = values[i]
+            if g >= 0 and v == v and (best[g] < 0 or v > values[best[g]]):
+                best[g] = i
+        return best
+
+def aggregate_quarterly(stock_buys):
+    """Sum invested amount, current value and P&L per (ticker, quarter)"""
+    if 'quarter_period' in stock_buys.columns:
+        quarter = stock_buys['quarter_period'].rename('quarter')
+    else:
+        quarter = stock_buys['date'].dt.to_period('Q').rename('quarter')
+    if not NUMBA_AVAILABLE or len(stock_buys) < NUMBA_MIN_ROWS:
+        return stock_buys.groupby(
+            [stock_buys['ticker'], quarter], observed=True, sort=False
+        )[QUARTERLY_SUM_COLUMNS].sum().reset_index()
+
+    # Encode both keys as integer codes and scatter the sums in one compiled pass
+    ticker_codes, tickers = pd.factorize(stock_buys['ticker'])
+    quarter_codes, quarters = pd.factorize(quarter)
+    valid = (ticker_codes >= 0) & (quarter_codes >= 0)
+    n_quarters = len(quarters)
+    group_ids = ticker_codes[valid].astype(np.int64) * n_quarters + quarter_codes[valid]
+    values = stock_buys.loc[valid, QUARTERLY_SUM_COLUMNS].to_numpy(dtype=np.float64)
+    sums = _scatter_group_sums(group_ids, values, len(tickers) * n_quarters)
+
+    # Keep only the (ticker, quarter) pairs that actually occur
+    present = np.unique(group_ids)
+    result = pd.DataFrame(sums[present], columns=QUARTERLY_SUM_COLUMNS)
+    result.insert(0, 'quarter', quarters.take(present % n_quarters))
+    result.insert(0, 'ticker', tickers.take(present // n_quarters))
+    return result
+
+def build_stock_performance(stock_buys):
+    """Per-ticker totals, returns and star ratings for the 1-year stock buys"""
+    # Group by ticker and calculate performance metrics
+    stock_performance = stock_buys.groupby('ticker', observed=True).agg({
+        'invested_amount': 'sum',
+        'current_value': 'sum',
+        'unrealized_pnl': 'sum',
+        'quantity': 'sum',
+        'date': 'max'  # Latest buy date
+    }).reset_index()
+
+    # Calculate additional metrics
+    stock_performance['pnl_percentage'] = pnl_percentage(stock_performance)
+    stock_performance['avg_price'] = stock_performance['invested_amount'] / stock_performance['quantity']
+
+    # Add stock ratings based on performance (bucketed in one pass)
+    rating_bins = np.array([-10, 0, 10, 20])
+    rating_labels = np.array(['❌ Very Poor', '⚠️ Poor', '⭐ Fair', '⭐⭐ Good', '⭐⭐⭐ Excellent'])
+    pnl_pct = stock_performance['pnl_percentage'].to_numpy(dtype=float)
+    rating_idx = np.digitize(pnl_pct, rating_bins)
+    rating_idx[np.isnan(pnl_pct)] = 0
+    stock_performance['rating'] = rating_labels[rating_idx]
+    stock_performance['rating_color'] = np.select(
+        [pnl_pct >= 10, pnl_pct >= 0], ['green', 'orange'], default='red'
+    )
+    
+    return stock_performance
+
+def build_quarterly_gains(stock_buys):
+    """Per-(ticker, quarter) gains with stock names, in chronological order"""
+    # Create quarterly data for every stock in one (ticker, quarter) pass
+    all_quarterly = aggregate_quarterly(stock_buys)
+
+    # Add stock name information
+    if 'stock_name' in stock_buys.columns:
+        stock_names = stock_buys[['ticker', 'stock_name']].drop_duplicates('ticker')
+        all_quarterly = all_quarterly.merge(stock_names, on='ticker', how='left')
+    else:
+        all_quarterly['stock_name'] = all_quarterly['ticker']
+
+    if not all_quarterly.empty:
+        # Periods sort chronologically, so no helper sort key is needed;
+        # the display label is formatted once after sorting
+        all_quarterly = all_quarterly.sort_values('quarter')
+        all_quarterly['quarter_label'] = all_quarterly['quarter'].dt.strftime('%Y Q%q')
+    
+    return all_quarterly
+
+# Group ratings by overall return: [-inf, 0) Poor, [0, 10) Fair, [10, 20) Good, [20, inf) Excellent
+GROUP_RATING_BINS = [-np.inf, 0, 10, 20, np.inf]
+GROUP_RATING_LABELS = ["🔴 Poor", "🟠 Fair", "🟡 Good", "🟢 Excellent"]
+GROUP_RATING_COLORS = {
+    "🟢 Excellent": 'background-color: #d4edda; color: #155724;',
+    "🟡 Good": 'background-color: #fff3cd; color: #856404;',
+    "🟠 Fair": 'background-color: #f8d7da; color: #721c24;',
+    "🔴 Poor": 'background-color: #f8d7da; color: #721c24;'
+}
+
+def style_group_ratings(ratings_df):
+    """Colour every cell of each ratings row by its Rating in one Styler pass"""
+    row_colors = ratings_df['Rating'].map(GROUP_RATING_COLORS).fillna('').to_numpy(dtype=object)
+    
+    def row_styles(frame):
+        # Broadcast the per-row CSS across the columns as a view, no per-cell copies
+        return pd.DataFrame(
+            np.broadcast_to(row_colors[:, None], frame.shape),
+            index=frame.index, columns=frame.columns
+        )
+    
+    return ratings_df.style.apply(row_styles, axis=None)
+
+def best_row_per_group(per_group_ticker, key):
+    """Index label of the highest-return (group, ticker) row for each group"""
+    if not NUMBA_AVAILABLE or len(per_group_ticker) < NUMBA_MIN_ROWS:
+        return per_group_ticker.groupby(level=key, sort=False, observed=True)['pnl_percentage'].idxmax()
+    
+    # One compiled scan over the group codes instead of a pandas groupby
+    group_codes, groups = pd.factorize(per_group_ticker.index.get_level_values(key))
+    positions = _group_argmax(
+        group_codes, per_group_ticker['pnl_percentage'].to_numpy(dtype=float), len(groups)
+    )
+    found = positions >= 0
+    return pd.Series(list(per_group_ticker.index[positions[found]]), index=groups[found])
+
+def build_group_ratings(group_performance, per_group_ticker, ticker_info, key, detail_key):
+    """Rate each sector/channel and pick its best stock.
+    
+    group_performance holds the per-group totals, per_group_ticker the (group, ticker)
+    sums with pnl_percentage. Returns (ratings_df, best_stocks_df) with groups in
+    first-seen order, skipping the 'Unknown' bucket. The best stock amounts stay
+    numeric so they sort correctly; BEST_STOCK_FORMATS formats them for display.
+    """
+    label = key.title()
+    groups = per_group_ticker.index.get_level_values(key).unique().astype(object)
+    groups = groups[groups.notna() & (groups != 'Unknown')]
+    
+    # Group totals come straight from the group aggregate, no re-summing per ticker
+    totals = group_performance.set_index(key).loc[groups]
+    invested = totals['invested_amount'].to_numpy(dtype=float)
+    current = totals['current_value'].to_numpy(dtype=float)
+    pnl = totals['unrealized_pnl'].to_numpy(dtype=float)
+    overall_return = safe_percent(pnl, invested, where=invested > 0)
+    ratings = np.asarray(
+        pd.cut(overall_return, bins=GROUP_RATING_BINS, labels=GROUP_RATING_LABELS, right=False),
+        dtype=object
+    )
+    
+    ratings_df = pd.DataFrame({
+        label: np.asarray(groups),
+        'Overall Return %': list(map(format_pct, overall_return)),
+        'Total Invested': list(map(format_money, invested)),
+        'Total Current Value': list(map(format_money, current)),
+        'Total P&L': list(map(format_money, pnl)),
+        'Rating': ratings
+    })
+    
+    # Best performing ticker in each group, with its details from ticker_info
+    best_idx = best_row_per_group(per_group_ticker, key)
+    best = per_group_ticker.loc[list(best_idx.loc[groups])].reset_index()
+    info = ticker_info.loc[best['ticker']]
+    
+    def info_column(name):
+        return info[name].to_numpy() if name in info.columns else 'N/A'
+    
+    best_stocks_df = pd.DataFrame({
+        label: np.asarray(groups),
+        'Best Stock': best['ticker'].to_numpy(),
+        'Stock Name': info_column('stock_name'),
+        detail_key.title(): info_column(detail_key),
+        'Return %': best['pnl_percentage'].to_numpy(dtype=float),
+        'Invested Amount': best['invested_amount'].to_numpy(dtype=float),
+        'Current Value': best['current_value'].to_numpy(dtype=float),
+        'P&L': best['unrealized_pnl'].to_numpy(dtype=float),
+        f'{label} Rating': ratings
+    })
+    
+    return ratings_df, best_stocks_df
+
+def build_ticker_info(stock_buys):
+    """First buy row per ticker, indexed by ticker, for name/sector/channel lookups"""
+    columns = [col for col in ('stock_name', 'sector', 'channel') if col in stock_buys.columns]
+    return stock_buys.drop_duplicates('ticker', keep='first').set_index('ticker')[columns]
+
+def build_group_table(group_performance, stock_buys, key):
+    """Detail table for a sector/channel aggregate: value, allocation, stock count and P&L"""
+    values = group_performance['current_value'].to_numpy(dtype=float)
+    pnl = group_performance['unrealized_pnl'].to_numpy(dtype=float)
+    alloc_pct = safe_percent(values, values.sum())
+    pnl_pct = safe_percent(pnl, values, where=values > 0)
+    counts = stock_buys.groupby(key, sort=False, observed=True)['ticker'].nunique()
+    
+    return pd.DataFrame({
+        key.title(): group_performance[key].to_numpy(),
+        'Current Value': list(map(format_money, values)),
+        'Allocation %': list(map(format_pct, alloc_pct)),
+        'Number of Stocks': counts.reindex(group_performance[key]).fillna(0).astype(int).to_numpy(),
+        'Total P&L': list(map(format_money, pnl)),
+        'P&L %': list(map(format_pct, pnl_pct))
+    })
+
+GROUP_SUM_COLUMNS = ['invested_amount', 'current_value', 'unrealized_pnl', 'quantity']
+
+# Below this many rows converting to polars costs more than the groupby saves
+POLARS_MIN_ROWS = 100_000
+
+def group_sums(stock_buys, keys):
+    """Sum GROUP_SUM_COLUMNS per keys, indexed by keys with groups in first-seen order.
+    
+    Uses polars when it is installed and the frame is large, pandas otherwise.
+    Rows with a missing key are dropped either way, as pandas groupby does.
+    """
+    if not POLARS_AVAILABLE or len(stock_buys) < POLARS_MIN_ROWS:
+        return stock_buys.groupby(keys, sort=False, observed=True)[GROUP_SUM_COLUMNS].sum()
+    
+    frame = pl.from_pandas(stock_buys[keys + GROUP_SUM_COLUMNS])
+    sums = (frame.drop_nulls(keys)
+            .group_by(keys, maintain_order=True)
+            .agg(pl.col(GROUP_SUM_COLUMNS).sum())
+            .to_pandas())
+    return sums.set_index(keys)
+
+def build_market_cap_grouped(stock_data):
+    """Per normalized ticker totals for the stocks with a market cap, with their category"""
+    # Filter stocks with market cap data
+    stocks_with_market_cap = stock_data.dropna(subset=['market_cap'])
+    
+    # Group by normalized ticker and aggregate data
+    market_cap_grouped = stocks_with_market_cap.groupby('normalized_ticker', observed=True).agg({
+        'market_cap': 'first',  # Take first market cap value
+        'current_value': 'sum',  # Sum current values for same stock
+        'invested_amount': 'sum',  # Sum invested amounts for same stock
+        'quantity': 'sum',  # Sum quantities for same stock
+        'ticker': lambda x: ', '.join(x.unique())  # Show all ticker variations
+    }).reset_index()
+    
+    # Categorize stocks by market cap (in Crores)
+    market_cap_grouped['market_cap_category'] = pd.cut(
+        market_cap_grouped['market_cap'], bins=MARKET_CAP_BINS, labels=MARKET_CAP_LABELS, right=False
+    )
+    # Sorted once here, largest first; the distribution and the breakdown table both reuse this order
+    return market_cap_grouped.sort_values('market_cap', ascending=False)
+
+PNL_SUM_COLUMNS = ['invested_amount', 'current_value', 'unrealized_pnl']
+
+PNL_KEYS = ['ticker', 'sector', 'channel']
+
+def pnl_base(df):
+    """P&L sums and the % sum/count per (ticker, sector, channel), indexed by those keys.
+    
+    Runs as one lazy polars query when polars is installed and the frame is large,
+    pandas otherwise. Missing sectors/channels are kept as their own group either way.
+    """
+    if not POLARS_AVAILABLE or len(df) < POLARS_MIN_ROWS:
+        return df.groupby(PNL_KEYS, observed=True, dropna=False).agg(
+            invested_amount=('invested_amount', 'sum'),
+            current_value=('current_value', 'sum'),
+            unrealized_pnl=('unrealized_pnl', 'sum'),
+            pnl_percentage_sum=('pnl_percentage', 'sum'),
+            pnl_percentage_count=('pnl_percentage', 'count')
+        )
+    
+    base = (pl.from_pandas(df[PNL_KEYS + PNL_SUM_COLUMNS + ['pnl_percentage']])
+            .lazy()
+            .group_by(PNL_KEYS)
+            .agg([
+                pl.col(PNL_SUM_COLUMNS).sum(),
+                pl.col('pnl_percentage').sum().alias('pnl_percentage_sum'),
+                pl.col('pnl_percentage').count().alias('pnl_percentage_count')
+            ])
+            .collect()
+            .to_pandas())
+    return base.set_index(PNL_KEYS).sort_index()
+
+def build_pnl_rollups(df):
+    """P&L by ticker, sector, channel and sector-channel from one groupby at the finest grain"""
+    # NaN sectors/channels stay in the base so the ticker totals still count those rows
+    base = pnl_base(df)
+    
+    # Per ticker: sums add up, the mean % is rebuilt from its sum and count
+    by_ticker = base.groupby(level='ticker', observed=True).sum()
+    summary = by_ticker[PNL_SUM_COLUMNS].reset_index()
+    summary['pnl_percentage'] = (
+        by_ticker['pnl_percentage_sum'] / by_ticker['pnl_percentage_count'].where(by_ticker['pnl_percentage_count'] > 0)
+    ).to_numpy()
+    summary['status'] = summary['unrealized_pnl'].apply(
+        lambda x: 'Profit' if x > 0 else 'Loss' if x < 0 else 'Break Even'
+    )
+    
+    def rollup(keys):
+        return (base.groupby(level=keys, observed=True)['unrealized_pnl'].sum().reset_index()
+                .sort_values('unrealized_pnl', ascending=False))
+    
+    return {
+        'summary': summary,
+        'by_sector': rollup('sector'),
+        'by_channel': rollup('channel'),
+        'combined': rollup(['sector', 'channel'])
+    }
+
+def top_categories(frame, key, value, limit=MAX_BAR_CATEGORIES):
+    """Keep the rows of frame with the largest |value|, summing the rest into one 'Other' row"""
+    if len(frame) <= limit:
+        return frame
+    keep = frame.index.isin(frame[value].abs().nlargest(limit - 1).index)
+    other = pd.DataFrame({key: ['Other'], value: [frame.loc[~keep, value].sum()]})
+    return pd.concat([frame.loc[keep, [key, value]], other], ignore_index=True)
+
+def build_ticker_channels(file_records, transactions):
+    """Map each ticker to the channel of the last file it appears in, as a Series"""
+    files = pd.DataFrame(
+        [record for record in file_records if 'filename' in record and 'channel' in record],
+        columns=['id', 'filename', 'channel']
+    )
+    trades = pd.DataFrame(transactions, columns=['file_id', 'ticker'])
+    if files.empty or trades.empty:
+        return pd.Series(dtype=object)
+    
+    # Files without a channel fall back to their filename
+    files['channel'] = files['channel'].where(
+        files['channel'].fillna('').astype(str).ne(''),
+        files['filename'].str.replace('.csv', '', regex=False).str.replace('_', ' ', regex=False)
+    )
+    
+    # Files keep their order in the join, so a later file wins for a shared ticker
+    ticker_channel_df = files[['id', 'channel']].merge(trades, left_on='id', right_on='file_id')
+    return ticker_channel_df.drop_duplicates('ticker', keep='last').set_index('ticker')['channel']
+
+# Supabase reads behind the files/settings pages, memoized per user so reruns that
+# only touch an unrelated widget skip the round trip
+USER_DATA_TTL_SECONDS = 60
+
+@st.cache_data(ttl=USER_DATA_TTL_SECONDS, show_spinner=False)
+def cached_file_records(user_id):
+    """File records for user_id, fetched from Supabase at most once per TTL"""
+    return get_file_records_supabase(user_id=user_id)
+
+@st.cache_data(ttl=USER_DATA_TTL_SECONDS, show_spinner=False)
+def cached_transactions(user_id):
+    """Transactions for user_id, fetched from Supabase at most once per TTL"""
+    return get_transactions_supabase(user_id=user_id)
+
+# File history table columns, in display order; the optional ones are shown only
+# when the records carry them
+FILE_HISTORY_COLUMNS = ['filename', 'customer_name', 'processed_at', 'status', 'file_path']
+
+def file_history_columns(record):
+    """Display columns present in a file record; every row of the table has the same keys"""
+    return [col for col in FILE_HISTORY_COLUMNS if col == 'filename' or col in record]
+
+def project_file_history(files):
+    """Column lists of the file history display columns, without building a full-width DataFrame"""
+    # Resolved from the first row instead of scanning every record per column
+    columns = file_history_columns(files[0]) if files else ['filename']
+    return {col: [record.get(col) for record in files] for col in columns}
+
+def count_file_history(files):
+    """Total, processed and recent (has processed_at) file counts in one pass over the records"""
+    total = processed = recent = 0
+    for record in files:
+        total += 1
+        processed += record.get('status') == 'processed'
+        recent += record.get('processed_at') is not None
+    return {'total': total, 'processed': processed, 'recent': recent}
+
+@st.cache_data(ttl=USER_DATA_TTL_SECONDS, show_spinner=False)
+def cached_file_history(user_id):
+    """Projected columns and counts of the user's file records, kept as long as the records are"""
+    files = cached_file_records(user_id)
+    return project_file_history(files), count_file_history(files)
+
+def clear_user_data_caches():
+    """Drop the memoized Supabase reads after a write or an explicit refresh"""
+    cached_file_records.clear()
+    cached_file_history.clear()
+    cached_transactions.clear()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_sector_channel_analytics(stock_buys):
+    """All sector/channel aggregates, tables, ratings and best stocks for stock_buys.
+    
+    Cached on the content of stock_buys, so widget reruns only redraw the charts.
+    """
+    analytics = {}
+    ticker_info = build_ticker_info(stock_buys)
+    
+    for key, detail_key in (('sector', 'channel'), ('channel', 'sector')):
+        # Group by sector/channel and calculate metrics, best return first
+        group_performance = group_sums(stock_buys, [key]).reset_index()
+        group_performance['pnl_percentage'] = pnl_percentage(group_performance)
+        group_performance = group_performance.sort_values('pnl_percentage', ascending=False)
+        
+        # Every (group, ticker) pair in one pass, for the ratings and best stocks
+        per_group_ticker = group_sums(stock_buys, [key, 'ticker'])
+        per_group_ticker['pnl_percentage'] = pnl_percentage(per_group_ticker)
+        ratings_df, best_stocks_df = build_group_ratings(
+            group_performance, per_group_ticker, ticker_info, key, detail_key
+        )
+        
+        analytics[f'{key}_performance'] = group_performance
+        analytics[f'{key}_table'] = build_group_table(group_performance, stock_buys, key)
+        analytics[f'{key}_ratings'] = ratings_df
+        analytics[f'{key}_best_stocks'] = best_stocks_df
+    
+    return analytics
+
 class PortfolioAnalytics:
     """Comprehensive Portfolio Analytics System"""
     
@@ -58,6 +767,20 @@ class PortfolioAnalytics:
             self.session_state.live_prices = {}
         if 'portfolio_data' not in self.session_state:
             self.session_state.portfolio_data = None
+        if 'portfolio_version' not in self.session_state:
+            self.session_state.portfolio_version = 0
+    
+    def get_derived_frame(self, name, build):
+        """Return a frame (or figure) derived from portfolio_data, rebuilt only when the data changes"""
+        # The day is part of the version because the 1-year windows move with it
+        version = (self.session_state.get('portfolio_version', 0), datetime.now().date())
+        cache = self.session_state.get('derived_frames')
+        if cache is None or cache['version'] != version:
+            cache = {'version': version, 'frames': {}}
+            self.session_state.derived_frames = cache
+        if name not in cache['frames']:
+            cache['frames'][name] = build()
+        return cache['frames'][name]
     
     def render_login_page(self):
         """Render the login/registration page"""
@@ -146,22 +869,10 @@ class PortfolioAnalytics:
                     st.rerun()
             
             with col2:
-                # Create and download sample CSV
-                sample_data = {
-                    'date': ['2024-01-15', '2024-01-20', '2024-02-01'],
-                    'ticker': ['RELIANCE', '120828', 'TCS'],
-                    'quantity': [100, 500, 50],
-                    'transaction_type': ['buy', 'buy', 'sell'],
-                    'price': [2500.50, 45.25, 3800.00],
-                    'stock_name': ['Reliance Industries', 'ICICI Prudential Technology Fund', 'Tata Consultancy Services'],
-                    'sector': ['Oil & Gas', 'Technology', 'Technology'],
-                    'channel': ['Direct', 'Online', 'Broker']
-                }
-                sample_df = pd.DataFrame(sample_data)
-                csv = sample_df.to_csv(index=False)
+                # Download the sample CSV
                 st.download_button(
                     label="📥 Download Sample CSV",
-                    data=csv,
+                    data=SAMPLE_CSV,
                     file_name="sample_investment_portfolio.csv",
                     mime="text/csv",
                     type="primary"
@@ -283,43 +994,25 @@ class PortfolioAnalytics:
         try:
             import pandas as pd
             
-            st.info(f"🔄 Processing file: {uploaded_file.name}")
+            debug_info("🔄 Processing file: %s", uploaded_file.name)
+            
+            # The uploader hands back the same file object on every rerun, so a second
+            # "Process File" click would otherwise start at EOF
+            uploaded_file.seek(0)
             
             # Read the CSV file
-            df = pd.read_csv(uploaded_file)
-            st.info(f"📊 File loaded with {len(df)} rows and columns: {list(df.columns)}")
+            df = read_uploaded_csv(uploaded_file)
+            debug_info("📊 File loaded with %d rows and columns: %s", len(df), df.columns)
             
             # Standardize column names
-            column_mapping = {
-                'Stock Name': 'stock_name',
-                'Stock_Name': 'stock_name',
-                'stock_name': 'stock_name',
-                'Ticker': 'ticker',
-                'ticker': 'ticker',
-                'Quantity': 'quantity',
-                'quantity': 'quantity',
-                'Price': 'price',
-                'price': 'price',
-                'Transaction Type': 'transaction_type',
-                'Transaction_Type': 'transaction_type',
-                'transaction_type': 'transaction_type',
-                'Date': 'date',
-                'date': 'date',
-                'Channel': 'channel',
-                'channel': 'channel',
-                'Sector': 'sector',
-                'sector': 'sector'
-            }
-            
-            # Rename columns
-            df = df.rename(columns=column_mapping)
-            st.info(f"🔄 Columns standardized: {list(df.columns)}")
+            df = df.rename(columns=UPLOAD_COLUMN_MAPPING)
+            debug_info("🔄 Columns standardized: %s", df.columns)
             
             # Extract channel from filename if not present
             if 'channel' not in df.columns:
                 channel_name = uploaded_file.name.replace('.csv', '').replace('_', ' ')
                 df['channel'] = channel_name
-                st.info(f"📁 Channel extracted from filename: {channel_name}")
+                debug_info("📁 Channel extracted from filename: %s", channel_name)
             
             # Ensure required columns exist
             required_columns = ['ticker', 'quantity', 'transaction_type', 'date']
@@ -334,12 +1027,12 @@ class PortfolioAnalytics:
             # Clean and validate data
             df = df.dropna(subset=['ticker', 'quantity'])
             df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
-            st.info(f"📊 Data cleaned: {len(df)} valid rows remaining")
+            debug_info("📊 Data cleaned: %d valid rows remaining", len(df))
             
             # Convert date to datetime
             df['date'] = pd.to_datetime(df['date'], errors='coerce')
             df = df.dropna(subset=['date'])
-            st.info(f"📅 Dates processed: {len(df)} rows with valid dates")
+            debug_info("📅 Dates processed: %d rows with valid dates", len(df))
             
             # Standardize transaction types
             df['transaction_type'] = df['transaction_type'].str.lower().str.strip()
@@ -354,7 +1047,7 @@ class PortfolioAnalytics:
             
             # Filter valid transaction types
             df = df[df['transaction_type'].isin(['buy', 'sell'])]
-            st.info(f"💼 Transaction types filtered: {len(df)} valid transactions")
+            debug_info("💼 Transaction types filtered: %d valid transactions", len(df))
             
             if df.empty:
                 st.warning(f"⚠️ No valid transactions found in {uploaded_file.name}")
@@ -369,7 +1062,7 @@ class PortfolioAnalytics:
                 df = self.fetch_historical_prices_for_transactions(df)
             
             # Save transactions to database
-            st.info(f"💾 Saving {len(df)} transactions to database...")
+            debug_info("💾 Saving %d transactions to database...", len(df))
             success = self.save_transactions_to_database(df, user_id, uploaded_file.name)
             
             if success:
@@ -380,11 +1073,8 @@ class PortfolioAnalytics:
                 return False
                 
         except Exception as e:
+            logger.exception("process_csv_file failed for %s", uploaded_file.name)
             st.error(f"❌ Error processing {uploaded_file.name}: {e}")
-            st.error(f"Error type: {type(e).__name__}")
-            st.error(f"Error details: {str(e)}")
-            import traceback
-            st.error(f"Traceback: {traceback.format_exc()}")
             return False
     
     def fetch_historical_prices_for_transactions(self, df):
@@ -469,6 +1159,7 @@ class PortfolioAnalytics:
             # First save file record (or get existing one)
             username = self.session_state.username if hasattr(self.session_state, 'username') else None
             file_record = save_file_record_supabase(filename, f"/uploads/{filename}", user_id, username)
+            clear_user_data_caches()
             if not file_record:
                 # Check if this is a duplicate file error
                 st.warning(f"⚠️ File {filename} may have already been processed")
@@ -508,6 +1199,7 @@ class PortfolioAnalytics:
             success = save_transactions_bulk_supabase(df, file_id, user_id)
             
             if success:
+                clear_user_data_caches()
                 st.success(f"✅ Saved {len(df)} transactions to database")
                 
                 # After saving transactions, fetch live prices and sectors for new tickers
@@ -585,8 +1277,8 @@ class PortfolioAnalytics:
         try:
             st.info("🔄 Updating missing historical prices...")
             
-            # Get user transactions
-            transactions = get_transactions_supabase(user_id=user_id)
+            # Get user transactions; shared with the price fetch and load_portfolio_data
+            transactions = cached_transactions(user_id)
             if not transactions:
                 return
             
@@ -658,8 +1350,8 @@ class PortfolioAnalytics:
             # Show data fetching animation
             self.show_data_fetching_animation()
             
-            # Get all transactions for the user
-            transactions = get_transactions_supabase(user_id=user_id)
+            # Get all transactions for the user; shared with load_portfolio_data
+            transactions = cached_transactions(user_id)
             if not transactions:
                 st.warning("No transactions found for user")
                 return
@@ -674,95 +1366,34 @@ class PortfolioAnalytics:
             sectors = {}
             market_caps = {}
             
-            # Fetch live prices and sectors for each ticker
-            for ticker in unique_tickers:
-                try:
-                    if str(ticker).isdigit() or ticker.startswith('MF_'):
-                        # Mutual fund - use numerical scheme code and get fund category from mftool
-                        from unified_price_fetcher import get_mutual_fund_price_and_category
-                        live_price, fund_category = get_mutual_fund_price_and_category(ticker, ticker, user_id, None)
-                        
-                        # Use fund category from mftool if available, otherwise default to "Mutual Fund"
-                        if fund_category and fund_category != 'Unknown':
-                            sector = fund_category
-                            print(f"✅ MF {ticker}: Using fund category '{sector}' from mftool")
-                        else:
-                            sector = "Mutual Fund"  # Fallback if no category available
-                            print(f"⚠️ MF {ticker}: No fund category available, using default 'Mutual Fund'")
-                    else:
-                        # Stock - fetch price, sector, and market cap from yfinance
-                        from unified_price_fetcher import get_stock_price_and_sector
-                        live_price, sector, market_cap = get_stock_price_and_sector(ticker, ticker, None)
-                        
-                        # Store market cap in session state for later use
-                        if market_cap and market_cap > 0:
-                            if not hasattr(self.session_state, 'market_caps'):
-                                self.session_state.market_caps = {}
-                            self.session_state.market_caps[ticker] = market_cap
-                        
-                        # If no sector from yfinance, try to get it from stock data table
-                        if not sector or sector == 'Unknown':
-                            stock_data = get_stock_data_supabase(ticker)
-                            sector = stock_data.get('sector', None) if stock_data else None
-                            
-                            # If still no sector, try to fetch it from stock_data_agent
-                            if not sector or sector == 'Unknown':
-                                try:
-                                    from stock_data_agent import get_sector
-                                    sector = get_sector(ticker)
-                                    if sector and sector != 'Unknown':
-                                        # Update the stock_data table with the sector
-                                        try:
-                                            if stock_data:
-                                                update_stock_data_supabase(ticker, sector=sector)
-                                            else:
-                                                # Create new stock data entry
-                                                from stock_data_agent import get_stock_name
-                                                stock_name = get_stock_name(ticker) or ticker
-                                                # This would require a create function - for now just store in session
-                                                pass
-                                        except Exception as e:
-                                            st.debug(f"Could not update sector for {ticker}: {e}")
-                                except Exception as e:
-                                    st.debug(f"Could not fetch sector for {ticker}: {e}")
-                                    sector = 'Unknown'
-                        
-                        # If still no sector, use a more intelligent categorization
-                        if not sector or sector == 'Unknown':
-                            # Try to categorize based on ticker name patterns
-                            ticker_upper = ticker.upper()
-                            if any(word in ticker_upper for word in ['BANK', 'HDFC', 'ICICI', 'SBI', 'AXIS', 'KOTAK']):
-                                sector = 'Banking'
-                            elif any(word in ticker_upper for word in ['TECH', 'INFY', 'TCS', 'WIPRO', 'HCL']):
-                                sector = 'Technology'
-                            elif any(word in ticker_upper for word in ['PHARMA', 'CIPLA', 'DRREDDY', 'SUNPHARMA']):
-                                sector = 'Pharmaceuticals'
-                            elif any(word in ticker_upper for word in ['AUTO', 'MARUTI', 'TATAMOTORS', 'BAJAJ']):
-                                sector = 'Automobile'
-                            elif any(word in ticker_upper for word in ['STEEL', 'TATASTEEL', 'JSWSTEEL']):
-                                sector = 'Metals & Mining'
-                            elif any(word in ticker_upper for word in ['OIL', 'ONGC', 'COAL']):
-                                sector = 'Oil & Gas'
-                            elif any(word in ticker_upper for word in ['CONSUMER', 'HINDUNILVR', 'ITC', 'NESTLE']):
-                                sector = 'Consumer Goods'
-                            elif any(word in ticker_upper for word in ['REALTY', 'DLF', 'GODREJ']):
-                                sector = 'Real Estate'
-                            elif any(word in ticker_upper for word in ['POWER', 'POWERGRID', 'NTPC']):
-                                sector = 'Power & Energy'
-                            else:
-                                sector = 'Other Stocks'
-                    
-                    if live_price and live_price > 0:
-                        live_prices[ticker] = live_price
-                        sectors[ticker] = sector
-                        
-                except Exception as e:
-                    st.warning(f"⚠️ Could not fetch data for {ticker}: {e}")
+            # Fetch live prices and sectors for all tickers at once; each fetch is
+            # network bound, so the threads overlap the round trips
+            with ThreadPoolExecutor(max_workers=PRICE_FETCH_WORKERS) as executor:
+                results = list(executor.map(lambda ticker: fetch_ticker_data(ticker, user_id), unique_tickers))
+            
+            for result in results:
+                ticker = result['ticker']
+                if 'error' in result:
+                    st.warning(f"⚠️ Could not fetch data for {ticker}: {result['error']}")
                     continue
+                
+                # Store market cap in session state for later use
+                market_cap = result['market_cap']
+                if market_cap and market_cap > 0:
+                    if not hasattr(self.session_state, 'market_caps'):
+                        self.session_state.market_caps = {}
+                    self.session_state.market_caps[ticker] = market_cap
+                
+                live_price = result['live_price']
+                if live_price and live_price > 0:
+                    live_prices[ticker] = live_price
+                    sectors[ticker] = result['sector']
             
             # Store in session state
             self.session_state.live_prices = live_prices
             self.session_state.sectors = sectors
+            # Invalidate frames derived from the previous market caps
+            self.session_state.portfolio_version = self.session_state.get('portfolio_version', 0) + 1
             
             st.success(f"✅ Fetched live prices for {len(live_prices)} tickers and sectors for {len(sectors)} tickers")
             
@@ -772,7 +1403,7 @@ class PortfolioAnalytics:
     def load_portfolio_data(self, user_id):
         """Load and process portfolio data"""
         try:
-            transactions = get_transactions_supabase(user_id=user_id)
+            transactions = cached_transactions(user_id)
             if not transactions:
                 return
             
@@ -803,17 +1434,28 @@ class PortfolioAnalytics:
             # Add sector information to the dataframe
             df['sector'] = df['ticker'].map(ticker_sectors)
             
+            # Flag MF_-prefixed tickers once so the pages can filter on a boolean column
+            df['is_mf'] = df['ticker'].astype(str).str.startswith('MF_')
+            
             # For mutual funds, set sector to "Mutual Fund"
-            df.loc[df['ticker'].astype(str).str.isdigit() | df['ticker'].str.startswith('MF_'), 'sector'] = 'Mutual Fund'
+            df.loc[df['ticker'].astype(str).str.isdigit() | df['is_mf'], 'sector'] = 'Mutual Fund'
             
             # Calculate portfolio metrics
             df['invested_amount'] = df['quantity'] * df['price']
             df['current_value'] = df['quantity'] * df['live_price'].fillna(df['price'])
             df['unrealized_pnl'] = df['current_value'] - df['invested_amount']
-            df['pnl_percentage'] = (df['unrealized_pnl'] / df['invested_amount']) * 100
-            
+            df['pnl_percentage'] = pnl_percentage(df)
+
             # Store processed data
+            df = shrink_portfolio(df)
+            # Sector/channel fallbacks run here once instead of on every P&L page visit
+            df = self._ensure_enriched_portfolio(df, transactions)
+            # Quarter keys are derived once here instead of on every quarterly rollup
+            if 'date' in df.columns:
+                df['quarter_period'] = df['date'].dt.to_period('Q')
             self.session_state.portfolio_data = df
+            # Invalidate frames derived from the previous data
+            self.session_state.portfolio_version = self.session_state.get('portfolio_version', 0) + 1
             
             # Set last refresh time
             self.session_state.last_refresh_time = datetime.now()
@@ -821,6 +1463,48 @@ class PortfolioAnalytics:
         except Exception as e:
             st.error(f"Error loading portfolio data: {e}")
     
+    def _ensure_enriched_portfolio(self, df, transactions=None):
+        """Fill in missing sector/channel columns once, so every page can group on them directly"""
+        if all(
+            col in df.columns and df[col].notna().any() and isinstance(df[col].dtype, pd.CategoricalDtype)
+            for col in ('sector', 'channel')
+        ):
+            return df
+        
+        # Ensure sector and channel information is available
+        if 'sector' not in df.columns or df['sector'].isna().all():
+            # Get sectors from live prices data
+            sectors = self.session_state.sectors if hasattr(self.session_state, 'sectors') else {}
+            df['sector'] = df['ticker'].astype(str).map(sectors).fillna('Unknown')
+        
+        if 'channel' not in df.columns or df['channel'].isna().all():
+            # Try to get channel from file records if available
+            try:
+                user_id = self.session_state.user_id
+                file_records = cached_file_records(user_id)
+                
+                if file_records:
+                    # All of the user's transactions (reusing the loaded ones), joined to their file's channel
+                    if transactions is None:
+                        transactions = get_transactions_supabase(user_id=user_id)
+                    ticker_channels = build_ticker_channels(file_records, transactions)
+                    
+                    # Add channel information to dataframe
+                    df['channel'] = df['ticker'].astype(str).map(ticker_channels).fillna('Unknown')
+            except Exception as e:
+                st.warning(f"Could not fetch channel information: {e}")
+                df['channel'] = 'Unknown'
+        
+        # The fallbacks above fill plain strings; keep both keys categorical so the
+        # pages' groupbys key on integer codes
+        for col in ('sector', 'channel'):
+            if col not in df.columns:
+                df[col] = 'Unknown'
+            if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        
+        return df
+    
     def show_loading_animation(self):
         """Show an engaging stock growth loading animation"""
         st.markdown("""
@@ -1169,32 +1853,23 @@ class PortfolioAnalytics:
                 try:
                     # Show processing message
                     st.sidebar.info("🔄 Processing file...")
-                    st.info(f"🔄 Starting to process file: {uploaded_file.name}")
                     
                     # Process the uploaded file with spinner
                     with st.spinner("Processing file..."):
-                        st.info(f"🔄 Calling process_csv_file for {uploaded_file.name}")
                         # Process the uploaded file directly using the same method as files page
                         success = self.process_csv_file(uploaded_file, self.session_state.user_id)
-                        st.info(f"🔄 process_csv_file returned: {success}")
+                        debug_info("🔄 Sidebar: processed %s, result %s", uploaded_file.name, success)
                         
                         if success:
                             st.sidebar.success("✅ File processed successfully!")
-                            st.info("🔄 File processed successfully, refreshing portfolio data...")
                             # Refresh portfolio data
                             self.load_portfolio_data(self.session_state.user_id)
-                            st.info("🔄 Portfolio data refreshed, calling rerun...")
                             st.rerun()
                         else:
                             st.sidebar.error("❌ Error processing file")
-                            st.error("❌ File processing returned False")
                 except Exception as e:
+                    logger.exception("Sidebar file processing failed")
                     st.sidebar.error(f"❌ Error: {e}")
-                    st.sidebar.error(f"Error details: {str(e)}")
-                    st.error(f"❌ Sidebar file processing error: {e}")
-                    st.error(f"Error type: {type(e).__name__}")
-                    import traceback
-                    st.error(f"Traceback: {traceback.format_exc()}")
         
         # Logout button
         st.sidebar.markdown("---")
@@ -1218,6 +1893,8 @@ class PortfolioAnalytics:
     
     def render_overview_page(self):
         """Render portfolio overview with key metrics"""
+        import plotly.express as px
+        import plotly.graph_objects as go
         st.header("🏠 Portfolio Overview")
         
         # Add refresh notification
@@ -1268,7 +1945,7 @@ class PortfolioAnalytics:
             if 'pnl_percentage' in df.columns and not df['pnl_percentage'].isna().all():
                 valid_data = df.dropna(subset=['pnl_percentage'])
                 if not valid_data.empty:
-                    top_performers = valid_data.groupby('ticker')['pnl_percentage'].sum().sort_values(ascending=False).head(5)
+                    top_performers = valid_data.groupby('ticker', observed=True)['pnl_percentage'].sum().sort_values(ascending=False).head(5)
                     if not top_performers.empty:
                         fig_top = px.bar(
                             x=top_performers.values,
@@ -1292,7 +1969,7 @@ class PortfolioAnalytics:
             if 'pnl_percentage' in df.columns and not df['pnl_percentage'].isna().all():
                 valid_data = df.dropna(subset=['pnl_percentage'])
                 if not valid_data.empty:
-                    underperformers = valid_data.groupby('ticker')['pnl_percentage'].sum().sort_values().head(5)
+                    underperformers = valid_data.groupby('ticker', observed=True)['pnl_percentage'].sum().sort_values().head(5)
                     if not underperformers.empty:
                         fig_bottom = px.bar(
                             x=underperformers.values,
@@ -1329,11 +2006,12 @@ class PortfolioAnalytics:
                     # Calculate cumulative invested amount over time
                     timeline_df['cumulative_invested'] = timeline_df['invested_amount'].cumsum()
                     
-                    # Create the investment timeline chart
+                    # Create the investment timeline chart (WebGL traces keep large
+                    # transaction histories responsive in the browser)
                     fig_timeline = go.Figure()
                     
                     # Add cumulative invested amount line
-                    fig_timeline.add_trace(go.Scatter(
+                    fig_timeline.add_trace(go.Scattergl(
                         x=timeline_df['date'],
                         y=timeline_df['cumulative_invested'],
                         mode='lines+markers',
@@ -1344,7 +2022,7 @@ class PortfolioAnalytics:
                     ))
                     
                     # Add individual transaction points
-                    fig_timeline.add_trace(go.Scatter(
+                    fig_timeline.add_trace(go.Scattergl(
                         x=timeline_df['date'],
                         y=timeline_df['invested_amount'],
                         mode='markers',
@@ -1362,7 +2040,7 @@ class PortfolioAnalytics:
                         title="Investment Timeline - Cumulative Amount Over Time",
                         xaxis_title="Date",
                         yaxis_title="Amount (₹)",
-                        hovermode='x unified',
+                        hovermode='x unified' if len(timeline_df) <= UNIFIED_HOVER_MAX_POINTS else 'closest',
                         showlegend=True,
                         legend=dict(
                             orientation="h",
@@ -1392,14 +2070,18 @@ class PortfolioAnalytics:
         
         # Recent transactions
         st.subheader("📋 Recent Transactions")
-        recent_transactions = df.sort_values('date', ascending=False).head(10)
+        # Partial selection of the 10 latest rows instead of sorting the whole frame
+        recent_columns = ['date', 'ticker', 'quantity', 'price', 'live_price', 'unrealized_pnl']
+        recent_transactions = df.loc[:, recent_columns].nlargest(10, 'date')
         st.dataframe(
-            recent_transactions[['date', 'ticker', 'quantity', 'price', 'live_price', 'unrealized_pnl']],
+            recent_transactions,
             width='stretch'
         )
     
     def render_performance_page(self):
         """Render performance analysis charts"""
+        import plotly.express as px
+        import plotly.graph_objects as go
         st.header("📈 Performance Analysis")
         
         if self.session_state.portfolio_data is None:
@@ -1429,12 +2111,26 @@ class PortfolioAnalytics:
             # Performance over time
             st.subheader("📊 Portfolio Performance Over Time")
             
+            # Aggregate once on the finest key; daily, sector and channel
+            # summaries are cheap rollups of this small frame
+            has_sector = 'sector' in df.columns and not df['sector'].isna().all()
+            has_channel = 'channel' in df.columns and not df['channel'].isna().all()
+            # Floor to the day on the datetime64 values rather than .dt.date,
+            # which materialises a column of Python date objects
+            group_keys = [df['date'].dt.floor('D')]
+            if has_sector:
+                group_keys.append('sector')
+            if has_channel:
+                group_keys.append('channel')
+            base_performance = self.get_derived_frame(
+                'base_performance',
+                lambda: df.groupby(group_keys, observed=True, sort=False, dropna=False)[
+                    ['invested_amount', 'current_value', 'unrealized_pnl']
+                ].sum()
+            )
+
             # Group by date and calculate cumulative performance
-            daily_performance = df.groupby(df['date'].dt.date).agg({
-                'invested_amount': 'sum',
-            'current_value': 'sum',
-                'unrealized_pnl': 'sum'
-        }).reset_index()
+            daily_performance = base_performance.groupby(level='date').sum().reset_index()
             
             daily_performance['cumulative_return'] = (
                 (daily_performance['current_value'] - daily_performance['invested_amount']) / 
@@ -1443,7 +2139,7 @@ class PortfolioAnalytics:
             
             # Performance line chart
             fig_performance = go.Figure()
-            fig_performance.add_trace(go.Scatter(
+            fig_performance.add_trace(go.Scattergl(
                 x=daily_performance['date'],
                 y=daily_performance['cumulative_return'],
                 mode='lines+markers',
@@ -1464,20 +2160,17 @@ class PortfolioAnalytics:
             st.subheader("🏆 Best Performing Sector & Channel")
             
             # Sector Performance
-            if 'sector' in df.columns and not df['sector'].isna().all():
-                sector_performance = df.groupby('sector').agg({
-                'invested_amount': 'sum',
-                'current_value': 'sum',
-                    'unrealized_pnl': 'sum'
-            }).reset_index()
-            
+            if has_sector:
+                sector_performance = base_performance.groupby(level='sector', sort=False, observed=True).sum().reset_index()
+
                 if not sector_performance.empty:
-                    sector_performance['pnl_percentage'] = (sector_performance['unrealized_pnl'] / sector_performance['invested_amount']) * 100
-                    sector_performance = sector_performance.sort_values('pnl_percentage', ascending=False)
+                    sector_performance['pnl_percentage'] = pnl_percentage(sector_performance)
+                    # Only the extremes are shown, so locate them without sorting
+                    sector_returns = sector_performance['pnl_percentage']
         
             col1, col2 = st.columns(2)
             with col1:
-                        best_sector = sector_performance.iloc[0]
+                        best_sector = sector_performance.loc[sector_returns.idxmax()]
                         best_sector_arrow = "🔼" if best_sector['pnl_percentage'] > 0 else "🔽" if best_sector['pnl_percentage'] < 0 else "➖"
                         best_sector_color = "normal" if best_sector['pnl_percentage'] > 0 else "inverse"
                         st.metric(
@@ -1489,7 +2182,7 @@ class PortfolioAnalytics:
                     
             with col2:
                 if len(sector_performance) > 1:
-                    worst_sector = sector_performance.iloc[-1]
+                    worst_sector = sector_performance.loc[sector_returns.idxmin()]
                     worst_sector_arrow = "🔼" if worst_sector['pnl_percentage'] > 0 else "🔽" if worst_sector['pnl_percentage'] < 0 else "➖"
                     worst_sector_color = "normal" if worst_sector['pnl_percentage'] > 0 else "inverse"
                     st.metric(
@@ -1500,20 +2193,17 @@ class PortfolioAnalytics:
                     )
             
             # Channel Performance
-            if 'channel' in df.columns and not df['channel'].isna().all():
-                channel_performance = df.groupby('channel').agg({
-                    'invested_amount': 'sum',
-                    'current_value': 'sum',
-                    'unrealized_pnl': 'sum'
-                }).reset_index()
-                
+            if has_channel:
+                channel_performance = base_performance.groupby(level='channel', sort=False, observed=True).sum().reset_index()
+
                 if not channel_performance.empty:
-                    channel_performance['pnl_percentage'] = (channel_performance['unrealized_pnl'] / channel_performance['invested_amount']) * 100
-                    channel_performance = channel_performance.sort_values('pnl_percentage', ascending=False)
+                    channel_performance['pnl_percentage'] = pnl_percentage(channel_performance)
+                    # Only the extremes are shown, so locate them without sorting
+                    channel_returns = channel_performance['pnl_percentage']
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        best_channel = channel_performance.iloc[0]
+                        best_channel = channel_performance.loc[channel_returns.idxmax()]
                         best_channel_arrow = "🔼" if best_channel['pnl_percentage'] > 0 else "🔽" if best_channel['pnl_percentage'] < 0 else "➖"
                         best_channel_color = "normal" if best_channel['pnl_percentage'] > 0 else "inverse"
                         st.metric(
@@ -1525,7 +2215,7 @@ class PortfolioAnalytics:
                     
                     with col2:
                         if len(channel_performance) > 1:
-                            worst_channel = channel_performance.iloc[-1]
+                            worst_channel = channel_performance.loc[channel_returns.idxmin()]
                             worst_channel_arrow = "🔼" if worst_channel['pnl_percentage'] > 0 else "🔽" if worst_channel['pnl_percentage'] < 0 else "➖"
                             worst_channel_color = "normal" if worst_channel['pnl_percentage'] > 0 else "inverse"
                             st.metric(
@@ -1541,54 +2231,31 @@ class PortfolioAnalytics:
             # Filter for stocks (not mutual funds) with buy transactions in the last 1 year
             one_year_ago = datetime.now() - timedelta(days=365)
             
-            # Filter stocks (exclude mutual funds) with buy transactions in last 1 year
-            stock_buys = df[
-                (~df['ticker'].astype(str).str.startswith('MF_')) & 
-                (df['transaction_type'] == 'buy') & 
-                (df['date'] >= one_year_ago)
-            ].copy()
+            # Filter stocks (exclude mutual funds) with buy transactions in last 1 year,
+            # fusing the conditions into one mask; stock_buys is only read below
+            def select_stock_buys():
+                buy_mask = ~df['is_mf'].to_numpy()
+                buy_mask &= df['transaction_type'].eq('buy').to_numpy()
+                buy_mask &= (df['date'] >= one_year_ago).to_numpy()
+                return df.loc[buy_mask]
+            
+            stock_buys = self.get_derived_frame('stock_buys', select_stock_buys)
              
             if not stock_buys.empty:
-                # Group by ticker and calculate performance metrics
-                stock_performance = stock_buys.groupby('ticker').agg({
-                    'invested_amount': 'sum',
-                    'current_value': 'sum',
-                    'unrealized_pnl': 'sum',
-                    'quantity': 'sum',
-                    'date': 'max'  # Latest buy date
-                }).reset_index()
-                
-                # Calculate additional metrics
-                stock_performance['pnl_percentage'] = (stock_performance['unrealized_pnl'] / stock_performance['invested_amount']) * 100
-                stock_performance['avg_price'] = stock_performance['invested_amount'] / stock_performance['quantity']
-                 
-                # Add stock ratings based on performance
-                def get_stock_rating(pnl_pct):
-                    if pnl_pct >= 20:
-                        return '⭐⭐⭐ Excellent'
-                    elif pnl_pct >= 10:
-                        return '⭐⭐ Good'
-                    elif pnl_pct >= 0:
-                        return '⭐ Fair'
-                    elif pnl_pct >= -10:
-                        return '⚠️ Poor'
-                    else:
-                        return '❌ Very Poor'
-                 
-                stock_performance['rating'] = stock_performance['pnl_percentage'].apply(get_stock_rating)
-                stock_performance['rating_color'] = stock_performance['pnl_percentage'].apply(
-                    lambda x: 'green' if x >= 10 else 'orange' if x >= 0 else 'red'
+                stock_performance = self.get_derived_frame(
+                    'stock_performance', lambda: build_stock_performance(stock_buys)
                 )
-                 
-                # Sort by P&L percentage
-                stock_performance = stock_performance.sort_values('pnl_percentage', ascending=False)
+                
+                # Only the top 10 are ranked; a partial selection avoids sorting every ticker.
+                # The detailed table is left unsorted, st.dataframe sorts client-side.
+                top_performers = stock_performance.nlargest(10, 'pnl_percentage')
                 
                 # Display top performers
                 st.subheader("🏆 Top Performers (1-Year Buy Transactions)")
                  
                 # Create performance chart
                 fig_stock_performance = px.bar(
-                    stock_performance.head(10),
+                    top_performers,
                     x='ticker',
                     y='pnl_percentage',
                     color='pnl_percentage',
@@ -1600,837 +2267,558 @@ class PortfolioAnalytics:
                 fig_stock_performance.update_xaxes(tickangle=45)
                 st.plotly_chart(fig_stock_performance, width='stretch')
                 
-                # Add comprehensive table with sector, channel, and ratings
-                st.subheader("📊 Detailed Performance Table (1-Year Buy Transactions)")
+                # The detailed table and quarterly analysis are only built once opened
+                with st.expander("📊 Detailed Performance Table (1-Year Buy Transactions)",
+                                 expanded=self.session_state.get('performance_table_opened', False)):
+                    if st.toggle("Load detailed performance table", key='performance_table_opened'):
+                        self._render_performance_table(stock_performance, stock_buys, top_performers)
                 
-                # Get additional data for the table (sector, channel, stock_name)
-                table_data = []
-                for _, row in stock_performance.iterrows():
-                    ticker = row['ticker']
-                    # Get additional details from original data
-                    ticker_data = stock_buys[stock_buys['ticker'] == ticker].iloc[0]
-                    
-                    table_row = {
-                        'Ticker': ticker,
-                        'Stock Name': ticker_data.get('stock_name', 'N/A'),
-                        'Sector': ticker_data.get('sector', 'Unknown'),
-                        'Channel': ticker_data.get('channel', 'N/A'),
-                        'Quantity': f"{row['quantity']:,.0f}",
-                        'Avg Price': f"₹{row['avg_price']:,.2f}",
-                        'Invested Amount': f"₹{row['invested_amount']:,.2f}",
-                        'Current Value': f"₹{row['current_value']:,.2f}",
-                        'P&L': f"₹{row['unrealized_pnl']:,.2f}",
-                        'Return %': f"{row['pnl_percentage']:.2f}%",
-                        'Rating': row['rating']
-                    }
-                    table_data.append(table_row)
+                with st.expander("📅 Quarterly Performance Analysis (1-Year Buy Transactions)",
+                                 expanded=self.session_state.get('quarterly_opened', False)):
+                    if st.toggle("Load quarterly analysis", key='quarterly_opened'):
+                        self._render_quarterly_analysis(stock_buys)
                 
-                # Create a styled table
-                if table_data:
-                    # Convert to DataFrame for better display
-                    table_df = pd.DataFrame(table_data)
-                    
-                    # Apply color coding based on performance
-                    def color_rating(val):
-                        if '⭐⭐⭐' in str(val):
-                            return 'background-color: #d4edda; color: #155724;'  # Green for excellent
-                        elif '⭐⭐' in str(val):
-                            return 'background-color: #fff3cd; color: #856404;'   # Yellow for good
-                        elif '⭐' in str(val):
-                            return 'background-color: #f8d7da; color: #721c24;'  # Red for fair
-                        elif '⚠️' in str(val):
-                            return 'background-color: #f8d7da; color: #721c24;'  # Red for poor
-                        elif '❌' in str(val):
-                            return 'background-color: #f8d7da; color: #721c24;'  # Red for very poor
-                        return ''
-                    
-                    # Apply styling
-                    styled_table = table_df.style.applymap(color_rating, subset=['Rating'])
-                    
-                    # Display the styled table
-                    st.dataframe(
-                        styled_table,
-                        use_container_width=True,
-                        hide_index=True
+                # Add comprehensive charts for sector and channel analysis
+                self._render_sector_channel(stock_buys, stock_performance, top_performers)
+            else:
+                st.info("No stock buy transactions found in the last 1 year")
+                
+        except Exception as e:
+            st.error(f"Error processing performance data: {e}")
+    
+    @fragment
+    def _render_sector_channel(self, stock_buys, stock_performance, top_performers):
+        """Render the sector & channel analysis as a fragment, so it reruns on its own"""
+        import plotly.express as px
+        # Skip all aggregation and charts when there is nothing to compare: fewer than
+        # two buys, or no transaction with a known sector or channel
+        has_known_groups = any(
+            stock_buys[key].dropna().ne('Unknown').any()
+            for key in ('sector', 'channel') if key in stock_buys.columns
+        )
+        if len(stock_buys) < 2 or not has_known_groups:
+            st.info("Not enough data for sector/channel analysis")
+            return
+        
+        st.subheader("📊 Sector & Channel Analysis (1-Year Buy Transactions)")
+        
+        # All aggregation for this section is cached, reruns only redraw it
+        analytics = compute_sector_channel_analytics(stock_buys)
+        sector_performance = analytics['sector_performance']
+        channel_performance = analytics['channel_performance']
+        
+        # Create two columns for charts
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Sector Performance Chart
+            st.subheader("🏭 Sector Performance Analysis")
+            
+            # Create sector performance chart
+            fig_sector_perf = px.bar(
+                sector_performance,
+                x='sector',
+                y='pnl_percentage',
+                color='pnl_percentage',
+                color_continuous_scale='RdYlGn',
+                title="Sector Performance by Return %",
+                labels={'pnl_percentage': 'Return %', 'sector': 'Sector'},
+                hover_data=['invested_amount', 'unrealized_pnl']
+            )
+            fig_sector_perf.update_xaxes(tickangle=45)
+            fig_sector_perf.update_layout(uirevision='sector_performance', dragmode=False)
+            st.plotly_chart(fig_sector_perf, width='stretch', config=SUMMARY_CHART_CONFIG)
+            
+            # Best performing sector
+            if not sector_performance.empty:
+                best_sector = sector_performance.iloc[0]
+                sector_return = best_sector['pnl_percentage']
+                sector_arrow = "🔼" if sector_return >= 0 else "🔽"
+                sector_color = "normal" if sector_return >= 0 else "inverse"
+                st.metric(
+                    "🏆 Best Performing Sector",
+                    best_sector['sector'],
+                    delta=f"{sector_arrow} {sector_return:.2f}% return",
+                    delta_color=sector_color
+                )
+        
+        with col2:
+            # Channel Performance Chart
+            st.subheader("📡 Channel Performance Analysis")
+            
+            # Create channel performance chart
+            fig_channel_perf = px.bar(
+                channel_performance,
+                x='channel',
+                y='pnl_percentage',
+                color='pnl_percentage',
+                color_continuous_scale='RdYlGn',
+                title="Channel Performance by Return %",
+                labels={'pnl_percentage': 'Return %', 'channel': 'Channel'},
+                hover_data=['invested_amount', 'unrealized_pnl']
+            )
+            fig_channel_perf.update_xaxes(tickangle=45)
+            fig_channel_perf.update_layout(uirevision='channel_performance', dragmode=False)
+            st.plotly_chart(fig_channel_perf, width='stretch', config=SUMMARY_CHART_CONFIG)
+            
+            # Best performing channel
+            if not channel_performance.empty:
+                best_channel = channel_performance.iloc[0]
+                channel_return = best_channel['pnl_percentage']
+                channel_arrow = "🔼" if channel_return >= 0 else "🔽"
+                channel_color = "normal" if channel_return >= 0 else "inverse"
+                st.metric(
+                    "🏆 Best Performing Channel",
+                    best_channel['channel'],
+                    delta=f"{channel_arrow} {channel_return:.2f}% return",
+                    delta_color=channel_color
+                )
+        
+        # Add detailed analysis tables below the charts
+        st.subheader("📊 Detailed Analysis Tables")
+        
+        # Create two columns for detailed tables
+        table_col1, table_col2 = st.columns(2)
+        
+        with table_col1:
+            # Sector Analysis Details
+            st.subheader("🏭 Sector Analysis Details")
+            
+            sector_df = analytics['sector_table']
+            
+            # Display sector table
+            if not sector_df.empty:
+                st.dataframe(
+                    sector_df,
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("No detailed sector data available for table display")
+        
+        with table_col2:
+            # Channel Analysis Details
+            st.subheader("📡 Channel Analysis Details")
+            
+            channel_df = analytics['channel_table']
+            
+            # Display channel table
+            if not channel_df.empty:
+                st.dataframe(
+                    channel_df,
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("No detailed channel data available for table display")
+        
+        # Add summary metrics below the tables in a balanced layout
+        st.subheader("📈 Summary Metrics")
+        
+        # Create two columns for summary metrics
+        metrics_col1, metrics_col2 = st.columns(2)
+        
+        with metrics_col1:
+            # Sector summary metrics
+            if not sector_df.empty:
+                st.subheader("🏭 Sector Summary")
+                
+                # Calculate sector metrics based on current value (not P&L percentage);
+                # only the extremes are shown, so no re-sort by value is needed
+                sector_values = sector_performance['current_value']
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(
+                        "Total Sectors",
+                        len(sector_performance),
+                        f"{len(sector_performance)} sectors covered"
                     )
-                    
-                    # Add summary statistics
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        avg_return = stock_performance['pnl_percentage'].mean()
-                        avg_arrow = "🔼" if avg_return >= 0 else "🔽"
-                        avg_color = "normal" if avg_return >= 0 else "inverse"
-                        st.metric(
-                            "Total Invested",
-                            f"₹{stock_performance['invested_amount'].sum():,.2f}",
-                            delta=f"{avg_arrow} {avg_return:.2f}% avg return",
-                            delta_color=avg_color
-                        )
-                    with col2:
-                        total_pnl = stock_performance['unrealized_pnl'].sum()
-                        pnl_arrow = "🔼" if total_pnl >= 0 else "🔽"
-                        pnl_delta = f"{pnl_arrow} ₹{total_pnl:,.2f} total P&L"
-                        pnl_color = "normal" if total_pnl >= 0 else "inverse"
-                        
-                        st.metric(
-                            "Total Current Value",
-                            f"₹{stock_performance['current_value'].sum():,.2f}",
-                            delta=pnl_delta,
-                            delta_color=pnl_color
-                        )
-                    with col3:
-                        best_return = stock_performance.iloc[0]['pnl_percentage']
-                        best_arrow = "🔼" if best_return >= 0 else "🔽"
-                        best_color = "normal" if best_return >= 0 else "inverse"
-                        st.metric(
-                            "Best Performer",
-                            stock_performance.iloc[0]['ticker'],
-                            delta=f"{best_arrow} {best_return:.2f}% return",
-                            delta_color=best_color
-                        )
-                else:
-                    st.info("No detailed data available for table display")
+                with col2:
+                    largest_sector = sector_performance.loc[sector_values.idxmax()]
+                    st.metric(
+                        "Largest Sector",
+                        largest_sector['sector'],
+                        f"₹{largest_sector['current_value']:,.2f}"
+                    )
+                with col3:
+                    smallest_sector = sector_performance.loc[sector_values.idxmin()]
+                    st.metric(
+                        "Smallest Sector",
+                        smallest_sector['sector'],
+                        f"₹{smallest_sector['current_value']:,.2f}"
+                    )
+        
+        with metrics_col2:
+            # Channel summary metrics
+            if not channel_df.empty:
+                st.subheader("📡 Channel Summary")
                 
-                # Add quarterly performance analysis
-                st.subheader("📅 Quarterly Performance Analysis (1-Year Buy Transactions)")
+                # Calculate channel metrics based on current value (not P&L percentage);
+                # only the extremes are shown, so no re-sort by value is needed
+                channel_values = channel_performance['current_value']
                 
-                try:
-                    # Create quarterly data for each stock
-                    quarterly_data = []
-                    
-                    for _, row in stock_performance.iterrows():
-                        ticker = row['ticker']
-                        ticker_transactions = stock_buys[stock_buys['ticker'] == ticker].copy()
-                        
-                        # Convert date to datetime if it's not already
-                        if not pd.api.types.is_datetime64_any_dtype(ticker_transactions['date']):
-                            ticker_transactions['date'] = pd.to_datetime(ticker_transactions['date'])
-                        
-                        # Add quarter information
-                        ticker_transactions['quarter'] = ticker_transactions['date'].dt.quarter
-                        ticker_transactions['year'] = ticker_transactions['date'].dt.year
-                        ticker_transactions['quarter_label'] = ticker_transactions['year'].astype(str) + ' Q' + ticker_transactions['quarter'].astype(str)
-                        
-                        # Group by quarter and calculate gains
-                        quarterly_gains = ticker_transactions.groupby('quarter_label').agg({
-                            'invested_amount': 'sum',
-                            'current_value': 'sum',
-                            'unrealized_pnl': 'sum'
-                        }).reset_index()
-                        
-                        # Add ticker information
-                        quarterly_gains['ticker'] = ticker
-                        quarterly_gains['stock_name'] = ticker_transactions.iloc[0].get('stock_name', ticker)
-                        
-                        quarterly_data.append(quarterly_gains)
-                    
-                    if quarterly_data:
-                        # Combine all quarterly data
-                        all_quarterly = pd.concat(quarterly_data, ignore_index=True)
-                        
-                        # Sort quarters chronologically for proper x-axis ordering
-                        # Create a sortable quarter key for chronological ordering
-                        def create_sort_key(quarter_label):
-                            try:
-                                # Extract year and quarter from "2024 Q1" format
-                                parts = quarter_label.split(' Q')
-                                if len(parts) == 2:
-                                    year = int(parts[0])
-                                    quarter = int(parts[1])
-                                    return year * 10 + quarter
-                                return 0
-                            except:
-                                return 0
-                        
-                        all_quarterly['sort_key'] = all_quarterly['quarter_label'].apply(create_sort_key)
-                        all_quarterly = all_quarterly.sort_values('sort_key')
-                        
-                        # Create quarterly chart with chronologically ordered x-axis
-                        fig_quarterly = px.bar(
-                            all_quarterly,
-                            x='quarter_label',
-                            y='unrealized_pnl',
-                            color='ticker',
-                            title="Quarterly Absolute Gains by Stock (1-Year Buy Transactions)",
-                            labels={
-                                'quarter_label': 'Quarter',
-                                'unrealized_pnl': 'Absolute Gain (₹)',
-                                'ticker': 'Stock Ticker'
-                            },
-                            hover_data=['stock_name', 'invested_amount', 'current_value'],
-                            barmode='group'
-                        )
-                        
-                        fig_quarterly.update_layout(
-                            xaxis_title="Quarter",
-                            yaxis_title="Absolute Gain (₹)",
-                            legend_title="Stock Ticker",
-                            height=500
-                        )
-                        
-                        # Ensure x-axis is ordered chronologically
-                        fig_quarterly.update_xaxes(
-                            tickangle=45,
-                            categoryorder='array',
-                            categoryarray=all_quarterly['quarter_label'].unique()
-                        )
-                        
-                        st.plotly_chart(fig_quarterly, width='stretch')
-                        
-                        # Add quarterly summary table
-                        st.subheader("📊 Quarterly Summary Table")
-                        
-                        # Create summary by quarter (also sorted chronologically)
-                        # Use nunique() for ticker count to get actual number of unique stocks per quarter
-                        quarterly_summary = all_quarterly.groupby('quarter_label').agg({
-                            'unrealized_pnl': 'sum',
-                            'invested_amount': 'sum',
-                            'current_value': 'sum',
-                            'ticker': 'nunique'  # Count unique tickers instead of all rows
-                        }).reset_index()
-                        
-                        # Ensure we have the expected columns before proceeding
-                        expected_columns = ['quarter_label', 'unrealized_pnl', 'invested_amount', 'current_value', 'ticker']
-                        if list(quarterly_summary.columns) == expected_columns:
-                            # Now add sort key and sort
-                            quarterly_summary['sort_key'] = quarterly_summary['quarter_label'].apply(create_sort_key)
-                            quarterly_summary = quarterly_summary.sort_values('sort_key')
-                            
-                            # Remove the sort_key column before renaming
-                            quarterly_summary = quarterly_summary.drop('sort_key', axis=1)
-                            
-                            # Rename columns
-                            quarterly_summary.columns = ['Quarter', 'Total Gain (₹)', 'Total Invested (₹)', 'Total Current Value (₹)', 'Number of Stocks']
-                            quarterly_summary['Return %'] = (quarterly_summary['Total Gain (₹)'] / quarterly_summary['Total Invested (₹)'] * 100).round(2)
-                            
-                            # Quarterly summary created successfully
-                        else:
-                            st.warning(f"Unexpected quarterly summary columns: {list(quarterly_summary.columns)}")
-                            st.info("Expected: quarter_label, unrealized_pnl, invested_amount, current_value, ticker")
-                            st.info(f"Actual columns: {list(quarterly_summary.columns)}")
-                            # Skip this quarter's processing
-                            st.info("Skipping quarterly analysis due to column mismatch")
-                            quarterly_summary = None
-                        
-                        # Display quarterly summary only if data is valid
-                        if quarterly_summary is not None:
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.dataframe(
-                                    quarterly_summary,
-                                    use_container_width=True,
-                                    hide_index=True
-                                )
-                            
-                            with col2:
-                                # Best performing quarter
-                                best_quarter = quarterly_summary.loc[quarterly_summary['Total Gain (₹)'].idxmax()]
-                                worst_quarter = quarterly_summary.loc[quarterly_summary['Total Gain (₹)'].idxmin()]
-                                avg_return = quarterly_summary['Return %'].mean()
-                                
-                                # Create single line display with arrows and colors
-                                st.markdown("**📊 Quarterly Performance Summary**")
-                                
-                                # Best quarter
-                                best_gain = best_quarter['Total Gain (₹)']
-                                best_arrow = "🔼" if best_gain >= 0 else "🔽"
-                                best_color = "green" if best_gain >= 0 else "red"
-                                
-                                st.markdown(f"""
-                                <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {best_color}; background-color: rgba(0,255,0,0.1);">
-                                    <strong>🏆 Best Quarter:</strong> {best_quarter['Quarter']} - {best_arrow} ₹{best_gain:,.2f}
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Worst quarter
-                                worst_gain = worst_quarter['Total Gain (₹)']
-                                worst_arrow = "🔼" if worst_gain >= 0 else "🔽"
-                                worst_color = "green" if worst_gain >= 0 else "red"
-                                
-                                st.markdown(f"""
-                                <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {worst_color}; background-color: rgba(255,0,0,0.1);">
-                                    <strong>⚠️ Worst Quarter:</strong> {worst_quarter['Quarter']} - {worst_arrow} ₹{worst_gain:,.2f}
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Average return
-                                avg_arrow = "🔼" if avg_return >= 0 else "🔽"
-                                avg_color = "green" if avg_return >= 0 else "red"
-                                
-                                st.markdown(f"""
-                                <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {avg_color}; background-color: rgba(0,0,255,0.1);">
-                                    <strong>📈 Average Return:</strong> {avg_arrow} {avg_return:.2f}% (Across {len(quarterly_summary)} quarters)
-                                </div>
-                                """, unsafe_allow_html=True)
-                        else:
-                            st.warning("Quarterly summary could not be generated due to data format issues")
-                    else:
-                        st.info("No quarterly data available for analysis")
-                        
-                except Exception as e:
-                    st.warning(f"Could not generate quarterly analysis: {str(e)}")
-                    st.info("This might be due to date format issues or insufficient data")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(
+                        "Total Channels",
+                        len(channel_performance),
+                        f"{len(channel_performance)} channels used"
+                    )
+                with col2:
+                    best_channel = channel_performance.loc[channel_values.idxmax()]
+                    st.metric(
+                        "Best Channel",
+                        best_channel['channel'],
+                        f"₹{best_channel['current_value']:,.2f}"
+                    )
+                with col3:
+                    worst_channel = channel_performance.loc[channel_values.idxmin()]
+                    st.metric(
+                        "Worst Channel",
+                        worst_channel['channel'],
+                        f"₹{worst_channel['current_value']:,.2f}"
+                    )
+        
+        # Best Stock in Each Sector
+        st.subheader("⭐ Best Stock in Each Sector (1-Year Buy Transactions)")
+        
+        sector_ratings_df = analytics['sector_ratings']
+        best_stocks_df = analytics['sector_best_stocks']
+        
+        # Display sector ratings table
+        if not sector_ratings_df.empty:
+            st.subheader("🏭 Sector Performance Ratings")
+            
+            # Apply color coding based on rating
+            styled_sector_ratings = style_group_ratings(sector_ratings_df)
+            
+            st.dataframe(
+                styled_sector_ratings,
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        # Display best stocks by sector table
+        if not best_stocks_df.empty:
+            # Apply color coding based on return percentage
+            styled_best_stocks = best_stocks_df.style.format(BEST_STOCK_FORMATS).apply(
+                return_colors, subset=['Return %']
+            )
+            
+            st.dataframe(
+                styled_best_stocks,
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            # Create chart showing best stocks by sector
+            best_stocks_chart_df = pd.DataFrame({
+                'Sector': best_stocks_df['Sector'],
+                'Best Stock': best_stocks_df['Best Stock'],
+                'Return %': best_stocks_df['Return %'].round(2)
+            })
+            
+            fig_best_stocks = px.bar(
+                best_stocks_chart_df,
+                x='Sector',
+                y='Return %',
+                color='Return %',
+                color_continuous_scale='RdYlGn',
+                title="Best Stock Performance by Sector",
+                labels={'Return %': 'Return %', 'Sector': 'Sector'},
+                hover_data=['Best Stock']
+            )
+            fig_best_stocks.update_xaxes(tickangle=45)
+            fig_best_stocks.update_layout(uirevision='best_stocks_by_sector', dragmode=False)
+            st.plotly_chart(fig_best_stocks, width='stretch', config=SUMMARY_CHART_CONFIG)
+        else:
+            st.info("No sector-based stock analysis data available")
+        
+        # Best Stock in Each Channel
+        st.subheader("📡 Best Stock in Each Channel (1-Year Buy Transactions)")
+        
+        channel_ratings_df = analytics['channel_ratings']
+        best_stocks_channel_df = analytics['channel_best_stocks']
+        
+        # Display channel ratings table
+        if not channel_ratings_df.empty:
+            st.subheader("📡 Channel Performance Ratings")
+            
+            # Apply color coding based on rating
+            styled_channel_ratings = style_group_ratings(channel_ratings_df)
+            
+            st.dataframe(
+                styled_channel_ratings,
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        # Display best stocks by channel table
+        if not best_stocks_channel_df.empty:
+            # Apply color coding based on return percentage
+            styled_best_stocks_channel = best_stocks_channel_df.style.format(BEST_STOCK_FORMATS).apply(
+                return_colors, subset=['Return %']
+            )
+            
+            st.dataframe(
+                styled_best_stocks_channel,
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            # Create chart showing best stocks by channel
+            best_stocks_channel_chart_df = pd.DataFrame({
+                'Channel': best_stocks_channel_df['Channel'],
+                'Best Stock': best_stocks_channel_df['Best Stock'],
+                'Return %': best_stocks_channel_df['Return %'].round(2)
+            })
+            
+            fig_best_stocks_channel = px.bar(
+                best_stocks_channel_chart_df,
+                x='Channel',
+                y='Return %',
+                color='Return %',
+                color_continuous_scale='RdYlGn',
+                title="Best Stock Performance by Channel",
+                labels={'Return %': 'Return %', 'Channel': 'Channel'},
+                hover_data=['Best Stock']
+            )
+            fig_best_stocks_channel.update_xaxes(tickangle=45)
+            fig_best_stocks_channel.update_layout(uirevision='best_stocks_by_channel', dragmode=False)
+            st.plotly_chart(fig_best_stocks_channel, width='stretch', config=SUMMARY_CHART_CONFIG)
+        else:
+            st.info("No channel-based stock analysis data available")
+            
+        # Summary metrics for the analysis
+        st.subheader("📈 Analysis Summary")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            total_sectors = stock_buys['sector'].nunique(dropna=False)
+            st.metric("Total Sectors", total_sectors)
+        
+        with col2:
+            total_channels = stock_buys['channel'].nunique(dropna=False)
+            st.metric("Total Channels", total_channels)
+        
+        with col3:
+            avg_return = stock_performance['pnl_percentage'].mean()
+            avg_arrow = "🔼" if avg_return >= 0 else "🔽"
+            avg_color = "normal" if avg_return >= 0 else "inverse"
+            st.metric("Average Return", f"{avg_arrow} {avg_return:.2f}%", delta_color=avg_color)
+        
+        with col4:
+            best_overall = top_performers.iloc[0]['pnl_percentage']
+            best_arrow = "🔼" if best_overall >= 0 else "🔽"
+            best_color = "normal" if best_overall >= 0 else "inverse"
+            st.metric("Best Return", f"{best_arrow} {best_overall:.2f}%", delta_color=best_color)
+
+    def _render_performance_table(self, stock_performance, stock_buys, top_performers):
+        """Render the detailed per-stock performance table with summary metrics"""
+        # Get additional data for the table (sector, channel, stock_name)
+        ticker_info = self.get_derived_frame('ticker_info', lambda: build_ticker_info(stock_buys))
+        info = ticker_info.loc[stock_performance['ticker']]
+        
+        def info_column(name, default):
+            return info[name].to_numpy() if name in info.columns else default
+        
+        # Build the table column by column from the per-ticker aggregate
+        table_df = pd.DataFrame({
+            'Ticker': stock_performance['ticker'].to_numpy(),
+            'Stock Name': info_column('stock_name', 'N/A'),
+            'Sector': info_column('sector', 'Unknown'),
+            'Channel': info_column('channel', 'N/A'),
+            'Quantity': list(map(format_count, stock_performance['quantity'])),
+            'Avg Price': list(map(format_money, stock_performance['avg_price'])),
+            'Invested Amount': list(map(format_money, stock_performance['invested_amount'])),
+            'Current Value': list(map(format_money, stock_performance['current_value'])),
+            'P&L': list(map(format_money, stock_performance['unrealized_pnl'])),
+            'Return %': list(map(format_pct, stock_performance['pnl_percentage'])),
+            'Rating': stock_performance['rating'].to_numpy()
+        })
+        
+        # Create a styled table
+        if not table_df.empty:
+            # Apply color coding based on performance; the rows follow stock_performance,
+            # so one vectorized pass over its returns colours the whole Rating column
+            rating_colors = return_colors(stock_performance['pnl_percentage'])
+            
+            # Apply styling
+            styled_table = table_df.style.apply(lambda _: rating_colors, subset=['Rating'])
+            
+            # Display the styled table
+            st.dataframe(
+                styled_table,
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            # Add summary statistics
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                avg_return = stock_performance['pnl_percentage'].mean()
+                avg_arrow = "🔼" if avg_return >= 0 else "🔽"
+                avg_color = "normal" if avg_return >= 0 else "inverse"
+                st.metric(
+                    "Total Invested",
+                    f"₹{stock_performance['invested_amount'].sum():,.2f}",
+                    delta=f"{avg_arrow} {avg_return:.2f}% avg return",
+                    delta_color=avg_color
+                )
+            with col2:
+                total_pnl = stock_performance['unrealized_pnl'].sum()
+                pnl_arrow = "🔼" if total_pnl >= 0 else "🔽"
+                pnl_delta = f"{pnl_arrow} ₹{total_pnl:,.2f} total P&L"
+                pnl_color = "normal" if total_pnl >= 0 else "inverse"
                 
-                # Add comprehensive charts for sector and channel analysis
-                if not stock_buys.empty:
-                    st.subheader("📊 Sector & Channel Analysis (1-Year Buy Transactions)")
+                st.metric(
+                    "Total Current Value",
+                    f"₹{stock_performance['current_value'].sum():,.2f}",
+                    delta=pnl_delta,
+                    delta_color=pnl_color
+                )
+            with col3:
+                best_return = top_performers.iloc[0]['pnl_percentage']
+                best_arrow = "🔼" if best_return >= 0 else "🔽"
+                best_color = "normal" if best_return >= 0 else "inverse"
+                st.metric(
+                    "Best Performer",
+                    top_performers.iloc[0]['ticker'],
+                    delta=f"{best_arrow} {best_return:.2f}% return",
+                    delta_color=best_color
+                )
+        else:
+            st.info("No detailed data available for table display")
+    
+    def _render_quarterly_analysis(self, stock_buys):
+        """Render quarterly gains chart and summary for the 1-year stock buys"""
+        import plotly.express as px
+        try:
+            # Create quarterly data for every stock, reused until the portfolio is refreshed
+            all_quarterly = self.get_derived_frame(
+                'quarterly_gains', lambda: build_quarterly_gains(stock_buys)
+            )
+            
+            if not all_quarterly.empty:
+                # Create quarterly chart with chronologically ordered x-axis
+                fig_quarterly = px.bar(
+                    all_quarterly,
+                    x='quarter_label',
+                    y='unrealized_pnl',
+                    color='ticker',
+                    title="Quarterly Absolute Gains by Stock (1-Year Buy Transactions)",
+                    labels={
+                        'quarter_label': 'Quarter',
+                        'unrealized_pnl': 'Absolute Gain (₹)',
+                        'ticker': 'Stock Ticker'
+                    },
+                    hover_data=['stock_name', 'invested_amount', 'current_value'],
+                    barmode='group'
+                )
+                
+                fig_quarterly.update_layout(
+                    xaxis_title="Quarter",
+                    yaxis_title="Absolute Gain (₹)",
+                    legend_title="Stock Ticker",
+                    height=500
+                )
+                
+                # Ensure x-axis is ordered chronologically ("YYYY Qn" labels sort lexically)
+                fig_quarterly.update_xaxes(
+                    tickangle=45,
+                    categoryorder='category ascending'
+                )
+                
+                st.plotly_chart(fig_quarterly, width='stretch')
+                
+                # Add quarterly summary table
+                st.subheader("📊 Quarterly Summary Table")
+                
+                # Create summary by quarter (also sorted chronologically)
+                # Use nunique() for ticker count to get actual number of unique stocks per quarter
+                quarterly_summary = all_quarterly.groupby('quarter').agg({
+                    'unrealized_pnl': 'sum',
+                    'invested_amount': 'sum',
+                    'current_value': 'sum',
+                    'ticker': 'nunique'  # Count unique tickers instead of all rows
+                }).reset_index()
+                
+                # Ensure we have the expected columns before proceeding
+                expected_columns = ['quarter', 'unrealized_pnl', 'invested_amount', 'current_value', 'ticker']
+                if list(quarterly_summary.columns) == expected_columns:
+                    # groupby already returns the periods in chronological order
+                    quarterly_summary['quarter'] = quarterly_summary['quarter'].dt.strftime('%Y Q%q')
+                    
+                    # Rename columns
+                    quarterly_summary.columns = ['Quarter', 'Total Gain (₹)', 'Total Invested (₹)', 'Total Current Value (₹)', 'Number of Stocks']
+                    quarterly_summary['Return %'] = (quarterly_summary['Total Gain (₹)'] / quarterly_summary['Total Invested (₹)'] * 100).round(2)
                     
-                    # Create two columns for charts
+                    # Quarterly summary created successfully
+                else:
+                    st.warning(f"Unexpected quarterly summary columns: {list(quarterly_summary.columns)}")
+                    st.info("Expected: quarter, unrealized_pnl, invested_amount, current_value, ticker")
+                    st.info(f"Actual columns: {list(quarterly_summary.columns)}")
+                    # Skip this quarter's processing
+                    st.info("Skipping quarterly analysis due to column mismatch")
+                    quarterly_summary = None
+                
+                # Display quarterly summary only if data is valid
+                if quarterly_summary is not None:
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        # Sector Performance Chart
-                        st.subheader("🏭 Sector Performance Analysis")
-                        
-                        # Group by sector and calculate metrics
-                        sector_performance = stock_buys.groupby('sector').agg({
-                            'invested_amount': 'sum',
-                            'current_value': 'sum',
-                            'unrealized_pnl': 'sum',
-                            'quantity': 'sum'
-                        }).reset_index()
-                        
-                        # Calculate sector P&L percentage
-                        sector_performance['pnl_percentage'] = (sector_performance['unrealized_pnl'] / sector_performance['invested_amount']) * 100
-                        sector_performance = sector_performance.sort_values('pnl_percentage', ascending=False)
-                        
-                        # Create sector performance chart
-                        fig_sector_perf = px.bar(
-                            sector_performance,
-                            x='sector',
-                            y='pnl_percentage',
-                            color='pnl_percentage',
-                            color_continuous_scale='RdYlGn',
-                            title="Sector Performance by Return %",
-                            labels={'pnl_percentage': 'Return %', 'sector': 'Sector'},
-                            hover_data=['invested_amount', 'unrealized_pnl']
-                        )
-                        fig_sector_perf.update_xaxes(tickangle=45)
-                        st.plotly_chart(fig_sector_perf, use_container_width=True)
-                        
-                        # Best performing sector
-                        if not sector_performance.empty:
-                            best_sector = sector_performance.iloc[0]
-                            sector_return = best_sector['pnl_percentage']
-                            sector_arrow = "🔼" if sector_return >= 0 else "🔽"
-                            sector_color = "normal" if sector_return >= 0 else "inverse"
-                            st.metric(
-                                "🏆 Best Performing Sector",
-                                best_sector['sector'],
-                                delta=f"{sector_arrow} {sector_return:.2f}% return",
-                                delta_color=sector_color
-                            )
-                    
-                    with col2:
-                        # Channel Performance Chart
-                        st.subheader("📡 Channel Performance Analysis")
-                        
-                        # Group by channel and calculate metrics
-                        channel_performance = stock_buys.groupby('channel').agg({
-                            'invested_amount': 'sum',
-                            'current_value': 'sum',
-                            'unrealized_pnl': 'sum',
-                            'quantity': 'sum'
-                        }).reset_index()
-                        
-                        # Calculate channel P&L percentage
-                        channel_performance['pnl_percentage'] = (channel_performance['unrealized_pnl'] / channel_performance['invested_amount']) * 100
-                        channel_performance = channel_performance.sort_values('pnl_percentage', ascending=False)
-                        
-                        # Create channel performance chart
-                        fig_channel_perf = px.bar(
-                            channel_performance,
-                            x='channel',
-                            y='pnl_percentage',
-                            color='pnl_percentage',
-                            color_continuous_scale='RdYlGn',
-                            title="Channel Performance by Return %",
-                            labels={'pnl_percentage': 'Return %', 'channel': 'Channel'},
-                            hover_data=['invested_amount', 'unrealized_pnl']
-                        )
-                        fig_channel_perf.update_xaxes(tickangle=45)
-                        st.plotly_chart(fig_channel_perf, use_container_width=True)
-                        
-                        # Best performing channel
-                        if not channel_performance.empty:
-                            best_channel = channel_performance.iloc[0]
-                            channel_return = best_channel['pnl_percentage']
-                            channel_arrow = "🔼" if channel_return >= 0 else "🔽"
-                            channel_color = "normal" if channel_return >= 0 else "inverse"
-                            st.metric(
-                                "🏆 Best Performing Channel",
-                                best_channel['channel'],
-                                delta=f"{channel_arrow} {channel_return:.2f}% return",
-                                delta_color=channel_color
-                            )
-                    
-                    # Add detailed analysis tables below the charts
-                    st.subheader("📊 Detailed Analysis Tables")
-                    
-                    # Create two columns for detailed tables
-                    table_col1, table_col2 = st.columns(2)
-                    
-                    with table_col1:
-                        # Sector Analysis Details
-                        st.subheader("🏭 Sector Analysis Details")
-                        
-                        # Create detailed sector table
-                        sector_table_data = []
-                        for _, row in sector_performance.iterrows():
-                            sector = row['sector']
-                            value = row['current_value']
-                            # Get sector-specific data
-                            sector_stocks = stock_buys[stock_buys['sector'] == sector]
-                            sector_count = len(sector_stocks['ticker'].unique())
-                            sector_pnl = sector_stocks['unrealized_pnl'].sum() if 'unrealized_pnl' in sector_stocks.columns else 0
-                            sector_pnl_pct = (sector_pnl / value * 100) if value > 0 else 0
-                            
-                            sector_table_data.append({
-                                'Sector': sector,
-                                'Current Value': f"₹{value:,.2f}",
-                                'Allocation %': f"{(value / sector_performance['current_value'].sum() * 100):.2f}%",
-                                'Number of Stocks': sector_count,
-                                'Total P&L': f"₹{sector_pnl:,.2f}",
-                                'P&L %': f"{sector_pnl_pct:.2f}%"
-                            })
-                        
-                        # Display sector table
-                        if sector_table_data:
-                            sector_df = pd.DataFrame(sector_table_data)
-                            st.dataframe(
-                                sector_df,
-                                use_container_width=True,
-                                hide_index=True
-                            )
-                        else:
-                            st.info("No detailed sector data available for table display")
-                    
-                    with table_col2:
-                        # Channel Analysis Details
-                        st.subheader("📡 Channel Analysis Details")
-                        
-                        # Create detailed channel table
-                        channel_table_data = []
-                        for _, row in channel_performance.iterrows():
-                            channel = row['channel']
-                            value = row['current_value']
-                            # Get channel-specific data
-                            channel_stocks = stock_buys[stock_buys['channel'] == channel]
-                            channel_count = len(channel_stocks['ticker'].unique())
-                            channel_pnl = channel_stocks['unrealized_pnl'].sum() if 'unrealized_pnl' in channel_stocks.columns else 0
-                            channel_pnl_pct = (channel_pnl / value * 100) if value > 0 else 0
-                            
-                            channel_table_data.append({
-                                'Channel': channel,
-                                'Current Value': f"₹{value:,.2f}",
-                                'Allocation %': f"{(value / channel_performance['current_value'].sum() * 100):.2f}%",
-                                'Number of Stocks': channel_count,
-                                'Total P&L': f"₹{channel_pnl:,.2f}",
-                                'P&L %': f"{channel_pnl_pct:.2f}%"
-                            })
-                        
-                        # Display channel table
-                        if channel_table_data:
-                            channel_df = pd.DataFrame(channel_table_data)
-                            st.dataframe(
-                                channel_df,
-                                use_container_width=True,
-                                hide_index=True
-                            )
-                        else:
-                            st.info("No detailed channel data available for table display")
-                    
-                    # Add summary metrics below the tables in a balanced layout
-                    st.subheader("📈 Summary Metrics")
-                    
-                    # Create two columns for summary metrics
-                    metrics_col1, metrics_col2 = st.columns(2)
-                    
-                    with metrics_col1:
-                        # Sector summary metrics
-                        if sector_table_data:
-                            st.subheader("🏭 Sector Summary")
-                            
-                            # Calculate sector metrics based on current value (not P&L percentage)
-                            sector_by_value = sector_performance.sort_values('current_value', ascending=False)
-                            
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric(
-                                    "Total Sectors",
-                                    len(sector_performance),
-                                    f"{len(sector_performance)} sectors covered"
-                                )
-                            with col2:
-                                largest_sector = sector_by_value.iloc[0]
-                                st.metric(
-                                    "Largest Sector",
-                                    largest_sector['sector'],
-                                    f"₹{largest_sector['current_value']:,.2f}"
-                                )
-                            with col3:
-                                smallest_sector = sector_by_value.iloc[-1]
-                                st.metric(
-                                    "Smallest Sector",
-                                    smallest_sector['sector'],
-                                    f"₹{smallest_sector['current_value']:,.2f}"
-                                )
-                    
-                    with metrics_col2:
-                        # Channel summary metrics
-                        if channel_table_data:
-                            st.subheader("📡 Channel Summary")
-                            
-                            # Calculate channel metrics based on current value (not P&L percentage)
-                            channel_by_value = channel_performance.sort_values('current_value', ascending=False)
-                            
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric(
-                                    "Total Channels",
-                                    len(channel_performance),
-                                    f"{len(channel_performance)} channels used"
-                                )
-                            with col2:
-                                best_channel = channel_by_value.iloc[0]
-                                st.metric(
-                                    "Best Channel",
-                                    best_channel['channel'],
-                                    f"₹{best_channel['current_value']:,.2f}"
-                                )
-                            with col3:
-                                worst_channel = channel_by_value.iloc[-1]
-                                st.metric(
-                                    "Worst Channel",
-                                    worst_channel['channel'],
-                                    f"₹{worst_channel['current_value']:,.2f}"
-                                )
-                    
-                    # Best Stock in Each Sector
-                    st.subheader("⭐ Best Stock in Each Sector (1-Year Buy Transactions)")
-                    
-                    # Find best performing stock in each sector and calculate sector ratings
-                    best_stocks_by_sector = []
-                    sector_ratings = []
-                    
-                    for sector in stock_buys['sector'].unique():
-                        if pd.isna(sector) or sector == 'Unknown':
-                            continue
-                            
-                        sector_stocks = stock_buys[stock_buys['sector'] == sector]
-                        
-                        # Group by ticker within sector
-                        sector_ticker_perf = sector_stocks.groupby('ticker').agg({
-                            'invested_amount': 'sum',
-                            'current_value': 'sum',
-                            'unrealized_pnl': 'sum',
-                            'quantity': 'sum'
-                        }).reset_index()
-                        
-                        # Calculate P&L percentage
-                        sector_ticker_perf['pnl_percentage'] = (sector_ticker_perf['unrealized_pnl'] / sector_ticker_perf['invested_amount']) * 100
-                        
-                        # Calculate sector overall performance
-                        sector_total_invested = sector_ticker_perf['invested_amount'].sum()
-                        sector_total_current = sector_ticker_perf['current_value'].sum()
-                        sector_total_pnl = sector_ticker_perf['unrealized_pnl'].sum()
-                        sector_overall_return = (sector_total_pnl / sector_total_invested) * 100 if sector_total_invested > 0 else 0
-                        
-                        # Determine sector rating
-                        if sector_overall_return >= 20:
-                            sector_rating = "🟢 Excellent"
-                            rating_color = "background-color: #d4edda; color: #155724;"
-                        elif sector_overall_return >= 10:
-                            sector_rating = "🟡 Good"
-                            rating_color = "background-color: #fff3cd; color: #856404;"
-                        elif sector_overall_return >= 0:
-                            sector_rating = "🟠 Fair"
-                            rating_color = "background-color: #f8d7da; color: #721c24;"
-                        else:
-                            sector_rating = "🔴 Poor"
-                            rating_color = "background-color: #f8d7da; color: #721c24;"
-                        
-                        # Store sector rating
-                        sector_ratings.append({
-                            'Sector': sector,
-                            'Overall Return %': f"{sector_overall_return:.2f}%",
-                            'Total Invested': f"₹{sector_total_invested:,.2f}",
-                            'Total Current Value': f"₹{sector_total_current:,.2f}",
-                            'Total P&L': f"₹{sector_total_pnl:,.2f}",
-                            'Rating': sector_rating
-                        })
-                        
-                        # Get best performing ticker in this sector
-                        if not sector_ticker_perf.empty:
-                            best_ticker = sector_ticker_perf.loc[sector_ticker_perf['pnl_percentage'].idxmax()]
-                            
-                            # Get additional details
-                            ticker_data = sector_stocks[sector_stocks['ticker'] == best_ticker['ticker']].iloc[0]
-                            
-                            best_stocks_by_sector.append({
-                                'Sector': sector,
-                                'Best Stock': best_ticker['ticker'],
-                                'Stock Name': ticker_data.get('stock_name', 'N/A'),
-                                'Channel': ticker_data.get('channel', 'N/A'),
-                                'Return %': f"{best_ticker['pnl_percentage']:.2f}%",
-                                'Invested Amount': f"₹{best_ticker['invested_amount']:,.2f}",
-                                'Current Value': f"₹{best_ticker['current_value']:,.2f}",
-                                'P&L': f"₹{best_ticker['unrealized_pnl']:,.2f}",
-                                'Sector Rating': sector_rating
-                            })
-                    
-                    # Display sector ratings table
-                    if sector_ratings:
-                        st.subheader("🏭 Sector Performance Ratings")
-                        sector_ratings_df = pd.DataFrame(sector_ratings)
-                        
-                        # Apply color coding based on rating
-                        def color_sector_rating(row):
-                            rating = row['Rating']
-                            if '🟢' in rating:
-                                return ['background-color: #d4edda; color: #155724;'] * len(row)
-                            elif '🟡' in rating:
-                                return ['background-color: #fff3cd; color: #856404;'] * len(row)
-                            elif '🟠' in rating:
-                                return ['background-color: #f8d7da; color: #721c24;'] * len(row)
-                            else:  # 🔴
-                                return ['background-color: #f8d7da; color: #721c24;'] * len(row)
-                        
-                        styled_sector_ratings = sector_ratings_df.style.apply(color_sector_rating, axis=1)
-                        
-                        st.dataframe(
-                            styled_sector_ratings,
-                            use_container_width=True,
-                            hide_index=True
-                        )
-                    
-                    # Display best stocks by sector table
-                    if best_stocks_by_sector:
-                        best_stocks_df = pd.DataFrame(best_stocks_by_sector)
-                        
-                        # Apply color coding based on return percentage
-                        def color_return(val):
-                            try:
-                                pct = float(str(val).replace('%', ''))
-                                if pct >= 20:
-                                    return 'background-color: #d4edda; color: #155724;'  # Green for excellent
-                                elif pct >= 10:
-                                    return 'background-color: #fff3cd; color: #856404;'   # Yellow for good
-                                elif pct >= 0:
-                                    return 'background-color: #f8d7da; color: #721c24;'  # Red for fair
-                                else:
-                                    return 'background-color: #f8d7da; color: #721c24;'  # Red for negative
-                            except:
-                                return ''
-                        
-                        styled_best_stocks = best_stocks_df.style.applymap(color_return, subset=['Return %'])
-                        
-                        st.dataframe(
-                            styled_best_stocks,
-                            use_container_width=True,
-                            hide_index=True
-                        )
-                        
-                        # Create chart showing best stocks by sector
-                        best_stocks_chart_data = []
-                        for row in best_stocks_by_sector:
-                            return_pct = float(row['Return %'].replace('%', ''))
-                            best_stocks_chart_data.append({
-                                'Sector': row['Sector'],
-                                'Best Stock': row['Best Stock'],
-                                'Return %': return_pct
-                            })
-                        
-                        if best_stocks_chart_data:
-                            best_stocks_chart_df = pd.DataFrame(best_stocks_chart_data)
-                            
-                            fig_best_stocks = px.bar(
-                                best_stocks_chart_df,
-                                x='Sector',
-                                y='Return %',
-                                color='Return %',
-                                color_continuous_scale='RdYlGn',
-                                title="Best Stock Performance by Sector",
-                                labels={'Return %': 'Return %', 'Sector': 'Sector'},
-                                hover_data=['Best Stock']
-                            )
-                            fig_best_stocks.update_xaxes(tickangle=45)
-                            st.plotly_chart(fig_best_stocks, use_container_width=True)
-                    else:
-                        st.info("No sector-based stock analysis data available")
-                    
-                    # Best Stock in Each Channel
-                    st.subheader("📡 Best Stock in Each Channel (1-Year Buy Transactions)")
-                    
-                    # Find best performing stock in each channel and calculate channel ratings
-                    best_stocks_by_channel = []
-                    channel_ratings = []
-                    
-                    for channel in stock_buys['channel'].unique():
-                        if pd.isna(channel) or channel == 'Unknown':
-                            continue
-                            
-                        channel_stocks = stock_buys[stock_buys['channel'] == channel]
-                        
-                        # Group by ticker within channel
-                        channel_ticker_perf = channel_stocks.groupby('ticker').agg({
-                            'invested_amount': 'sum',
-                            'current_value': 'sum',
-                            'unrealized_pnl': 'sum',
-                            'quantity': 'sum'
-                        }).reset_index()
-                        
-                        # Calculate P&L percentage
-                        channel_ticker_perf['pnl_percentage'] = (channel_ticker_perf['unrealized_pnl'] / channel_ticker_perf['invested_amount']) * 100
-                        
-                        # Calculate channel overall performance
-                        channel_total_invested = channel_ticker_perf['invested_amount'].sum()
-                        channel_total_current = channel_ticker_perf['current_value'].sum()
-                        channel_total_pnl = channel_ticker_perf['unrealized_pnl'].sum()
-                        channel_overall_return = (channel_total_pnl / channel_total_invested) * 100 if channel_total_invested > 0 else 0
-                        
-                        # Determine channel rating
-                        if channel_overall_return >= 20:
-                            channel_rating = "🟢 Excellent"
-                            rating_color = "background-color: #d4edda; color: #155724;"
-                        elif channel_overall_return >= 10:
-                            channel_rating = "🟡 Good"
-                            rating_color = "background-color: #fff3cd; color: #856404;"
-                        elif channel_overall_return >= 0:
-                            channel_rating = "🟠 Fair"
-                            rating_color = "background-color: #f8d7da; color: #721c24;"
-                        else:
-                            channel_rating = "🔴 Poor"
-                            rating_color = "background-color: #f8d7da; color: #721c24;"
-                        
-                        # Store channel rating
-                        channel_ratings.append({
-                            'Channel': channel,
-                            'Overall Return %': f"{channel_overall_return:.2f}%",
-                            'Total Invested': f"₹{channel_total_invested:,.2f}",
-                            'Total Current Value': f"₹{channel_total_current:,.2f}",
-                            'Total P&L': f"₹{channel_total_pnl:,.2f}",
-                            'Rating': channel_rating
-                        })
-                        
-                        # Get best performing ticker in this channel
-                        if not channel_ticker_perf.empty:
-                            best_ticker = channel_ticker_perf.loc[channel_ticker_perf['pnl_percentage'].idxmax()]
-                            
-                            # Get additional details
-                            ticker_data = channel_stocks[channel_stocks['ticker'] == best_ticker['ticker']].iloc[0]
-                            
-                            best_stocks_by_channel.append({
-                                'Channel': channel,
-                                'Best Stock': best_ticker['ticker'],
-                                'Stock Name': ticker_data.get('stock_name', 'N/A'),
-                                'Sector': ticker_data.get('sector', 'N/A'),
-                                'Return %': f"{best_ticker['pnl_percentage']:.2f}%",
-                                'Invested Amount': f"₹{best_ticker['invested_amount']:,.2f}",
-                                'Current Value': f"₹{best_ticker['current_value']:,.2f}",
-                                'P&L': f"₹{best_ticker['unrealized_pnl']:,.2f}",
-                                'Channel Rating': channel_rating
-                            })
-                    
-                    # Display channel ratings table
-                    if channel_ratings:
-                        st.subheader("📡 Channel Performance Ratings")
-                        channel_ratings_df = pd.DataFrame(channel_ratings)
-                        
-                        # Apply color coding based on rating
-                        def color_channel_rating(row):
-                            rating = row['Rating']
-                            if '🟢' in rating:
-                                return ['background-color: #d4edda; color: #155724;'] * len(row)
-                            elif '🟡' in rating:
-                                return ['background-color: #fff3cd; color: #856404;'] * len(row)
-                            elif '🟠' in rating:
-                                return ['background-color: #f8d7da; color: #721c24;'] * len(row)
-                            else:  # 🔴
-                                return ['background-color: #f8d7da; color: #721c24;'] * len(row)
-                        
-                        styled_channel_ratings = channel_ratings_df.style.apply(color_channel_rating, axis=1)
-                        
                         st.dataframe(
-                            styled_channel_ratings,
+                            quarterly_summary,
                             use_container_width=True,
                             hide_index=True
                         )
                     
-                    # Display best stocks by channel table
-                    if best_stocks_by_channel:
-                        best_stocks_channel_df = pd.DataFrame(best_stocks_by_channel)
+                    with col2:
+                        # Best performing quarter
+                        best_quarter = quarterly_summary.loc[quarterly_summary['Total Gain (₹)'].idxmax()]
+                        worst_quarter = quarterly_summary.loc[quarterly_summary['Total Gain (₹)'].idxmin()]
+                        avg_return = quarterly_summary['Return %'].mean()
                         
-                        # Apply color coding based on return percentage
-                        styled_best_stocks_channel = best_stocks_channel_df.style.applymap(color_return, subset=['Return %'])
+                        # Create single line display with arrows and colors
+                        st.markdown("**📊 Quarterly Performance Summary**")
                         
-                        st.dataframe(
-                            styled_best_stocks_channel,
-                            use_container_width=True,
-                            hide_index=True
-                        )
+                        best_gain = best_quarter['Total Gain (₹)']
+                        best_arrow = "🔼" if best_gain >= 0 else "🔽"
+                        best_color = "green" if best_gain >= 0 else "red"
                         
-                        # Create chart showing best stocks by channel
-                        best_stocks_channel_chart_data = []
-                        for row in best_stocks_by_channel:
-                            return_pct = float(row['Return %'].replace('%', ''))
-                            best_stocks_channel_chart_data.append({
-                                'Channel': row['Channel'],
-                                'Best Stock': row['Best Stock'],
-                                'Return %': return_pct
-                            })
-                        
-                        if best_stocks_channel_chart_data:
-                            best_stocks_channel_chart_df = pd.DataFrame(best_stocks_channel_chart_data)
-                            
-                            fig_best_stocks_channel = px.bar(
-                                best_stocks_channel_chart_df,
-                                x='Channel',
-                                y='Return %',
-                                color='Return %',
-                                color_continuous_scale='RdYlGn',
-                                title="Best Stock Performance by Channel",
-                                labels={'Return %': 'Return %', 'Channel': 'Channel'},
-                                hover_data=['Best Stock']
-                            )
-                            fig_best_stocks_channel.update_xaxes(tickangle=45)
-                            st.plotly_chart(fig_best_stocks_channel, use_container_width=True)
-                    else:
-                        st.info("No channel-based stock analysis data available")
+                        worst_gain = worst_quarter['Total Gain (₹)']
+                        worst_arrow = "🔼" if worst_gain >= 0 else "🔽"
+                        worst_color = "green" if worst_gain >= 0 else "red"
                         
-                    # Summary metrics for the analysis
-                    st.subheader("📈 Analysis Summary")
-                    
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        total_sectors = len(stock_buys['sector'].unique())
-                        st.metric("Total Sectors", total_sectors)
-                    
-                    with col2:
-                        total_channels = len(stock_buys['channel'].unique())
-                        st.metric("Total Channels", total_channels)
-                    
-                    with col3:
-                        avg_return = stock_performance['pnl_percentage'].mean()
                         avg_arrow = "🔼" if avg_return >= 0 else "🔽"
-                        avg_color = "normal" if avg_return >= 0 else "inverse"
-                        st.metric("Average Return", f"{avg_arrow} {avg_return:.2f}%", delta_color=avg_color)
-                    
-                    with col4:
-                        best_overall = stock_performance.iloc[0]['pnl_percentage']
-                        best_arrow = "🔼" if best_overall >= 0 else "🔽"
-                        best_color = "normal" if best_overall >= 0 else "inverse"
-                        st.metric("Best Return", f"{best_arrow} {best_overall:.2f}%", delta_color=best_color)
+                        avg_color = "green" if avg_return >= 0 else "red"
+                        
+                        # Best quarter, worst quarter and average return sent as one HTML block
+                        st.markdown(f"""
+                        <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {best_color}; background-color: rgba(0,255,0,0.1);">
+                            <strong>🏆 Best Quarter:</strong> {best_quarter['Quarter']} - {best_arrow} ₹{best_gain:,.2f}
+                        </div>
+                        <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {worst_color}; background-color: rgba(255,0,0,0.1);">
+                            <strong>⚠️ Worst Quarter:</strong> {worst_quarter['Quarter']} - {worst_arrow} ₹{worst_gain:,.2f}
+                        </div>
+                        <div style="margin: 10px 0; padding: 10px; border-left: 4px solid {avg_color}; background-color: rgba(0,0,255,0.1);">
+                            <strong>📈 Average Return:</strong> {avg_arrow} {avg_return:.2f}% (Across {len(quarterly_summary)} quarters)
+                        </div>
+                        """, unsafe_allow_html=True)
+                else:
+                    st.warning("Quarterly summary could not be generated due to data format issues")
             else:
-                st.info("No stock buy transactions found in the last 1 year")
+                st.info("No quarterly data available for analysis")
                 
         except Exception as e:
-            st.error(f"Error processing performance data: {e}")
+            st.warning(f"Could not generate quarterly analysis: {str(e)}")
+            st.info("This might be due to date format issues or insufficient data")
     
     def render_allocation_page(self):
         """Render asset allocation analysis"""
+        import plotly.express as px
         st.header("📊 Asset Allocation Analysis")
         
         if self.session_state.portfolio_data is None:
@@ -2440,19 +2828,25 @@ class PortfolioAnalytics:
         
         df = self.session_state.portfolio_data
         
+        # Categorize assets once; the column is kept on portfolio_data for later visits
+        if 'asset_type' not in df.columns:
+            df['asset_type'] = pd.Categorical(
+                np.where(df['ticker'].astype(str).str.startswith('MF_'), 'Mutual Fund', 'Stock')
+            )
+        
+        # Rows with a current value, selected once and shared by the sections below
+        # instead of a dropna copy per section
+        has_current_value = 'current_value' in df.columns and df['current_value'].notna().any()
+        valid_data = df.loc[df['current_value'].notna()] if has_current_value else df.iloc[0:0]
+        
         # Asset allocation by type
         st.subheader("🏦 Asset Allocation by Type")
         
-        if 'current_value' in df.columns and not df['current_value'].isna().all():
-            # Categorize assets
-            df['asset_type'] = df['ticker'].apply(
-                lambda x: 'Mutual Fund' if str(x).startswith('MF_') else 'Stock'
-            )
-            
-            # Filter out rows with missing current values
-            valid_data = df.dropna(subset=['current_value'])
+        if has_current_value:
             if not valid_data.empty:
-                allocation_by_type = valid_data.groupby('asset_type')['current_value'].sum()
+                allocation_by_type = self.get_derived_frame(
+                    'allocation_by_type', lambda: valid_data.groupby('asset_type', observed=True)['current_value'].sum()
+                )
                 
                 if not allocation_by_type.empty:
                     fig_type = px.pie(
@@ -2469,244 +2863,154 @@ class PortfolioAnalytics:
             st.info("Current value information not available for asset allocation")
         
         # Sector allocation
-        st.subheader("🏭 Sector Allocation")
-        
-        if 'sector' in df.columns and not df['sector'].isna().all():
-            # Filter out rows with missing sectors and check if we have data
-            sector_data = df.dropna(subset=['sector'])
-            if not sector_data.empty and 'current_value' in sector_data.columns:
-                sector_allocation = sector_data.groupby('sector')['current_value'].sum().sort_values(ascending=False)
-                
-                if not sector_allocation.empty:
-                    fig_sector = px.bar(
-                        x=sector_allocation.values,
-                        y=sector_allocation.index,
-                        orientation='h',
-                        title="Allocation by Sector",
-                        labels={'x': 'Current Value (₹)', 'y': 'Sector'}
+        # Sections below the first chart start collapsed, so their charts are only
+        # laid out in the browser once opened
+        with st.expander("🏭 Sector Allocation", expanded=False):
+            if 'sector' in df.columns and not df['sector'].isna().all():
+                # Filter out rows with missing sectors and check if we have data
+                sector_data = df.loc[df['sector'].notna()]
+                if not sector_data.empty and 'current_value' in sector_data.columns:
+                    sector_allocation = self.get_derived_frame(
+                        'sector_allocation',
+                        lambda: sector_data.groupby('sector', observed=True)['current_value'].sum().sort_values(ascending=False)
                     )
-                    st.plotly_chart(fig_sector, width='stretch')
                     
-                    # Sector allocation chart is sufficient here - detailed tables moved to Performance page
+                    if not sector_allocation.empty:
+                        fig_sector = px.bar(
+                            x=sector_allocation.values,
+                            y=sector_allocation.index,
+                            orientation='h',
+                            title="Allocation by Sector",
+                            labels={'x': 'Current Value (₹)', 'y': 'Sector'}
+                        )
+                        st.plotly_chart(fig_sector, width='stretch')
+                        
+                        # Sector allocation chart is sufficient here - detailed tables moved to Performance page
+                    else:
+                        st.info("No sector data available for visualization")
                 else:
-                    st.info("No sector data available for visualization")
+                    st.info("No sector or current value data available")
             else:
-                st.info("No sector or current value data available")
-        else:
-            st.info("Sector information not available in portfolio data")
+                st.info("Sector information not available in portfolio data")
         
         # Top holdings
-        st.subheader("📈 Top Holdings")
-        
-        if 'current_value' in df.columns and not df['current_value'].isna().all():
-            # Check if we have valid current value data
-            valid_data = df.dropna(subset=['current_value'])
-            if not valid_data.empty:
-                top_holdings = valid_data.groupby('ticker').agg({
-                    'current_value': 'sum',
-                    'unrealized_pnl': 'sum' if 'unrealized_pnl' in valid_data.columns else 'current_value',
-                    'pnl_percentage': 'mean' if 'pnl_percentage' in valid_data.columns else 'current_value'
-                }).sort_values('current_value', ascending=False).head(10)
-                
-                if not top_holdings.empty:
-                    fig_holdings = px.bar(
-                        x=top_holdings.index,
-                        y=top_holdings['current_value'],
-                        title="Top 10 Holdings by Current Value",
-                        labels={'x': 'Ticker', 'y': 'Current Value (₹)'}
-                    )
-                    fig_holdings.update_xaxes(tickangle=45)
-                    st.plotly_chart(fig_holdings, width='stretch')
+        with st.expander("📈 Top Holdings", expanded=False):
+            if has_current_value:
+                if not valid_data.empty:
+                    top_holdings = self.get_derived_frame('top_holdings', lambda: valid_data.groupby('ticker', observed=True).agg({
+                        'current_value': 'sum',
+                        'unrealized_pnl': 'sum' if 'unrealized_pnl' in valid_data.columns else 'current_value',
+                        'pnl_percentage': 'mean' if 'pnl_percentage' in valid_data.columns else 'current_value'
+                    }).sort_values('current_value', ascending=False).head(10))
+                    
+                    if not top_holdings.empty:
+                        fig_holdings = px.bar(
+                            x=top_holdings.index,
+                            y=top_holdings['current_value'],
+                            title="Top 10 Holdings by Current Value",
+                            labels={'x': 'Ticker', 'y': 'Current Value (₹)'}
+                        )
+                        fig_holdings.update_xaxes(tickangle=45)
+                        st.plotly_chart(fig_holdings, width='stretch')
+                    else:
+                        st.info("No holdings data available for visualization")
                 else:
-                    st.info("No holdings data available for visualization")
+                    st.info("No valid current value data available")
             else:
-                st.info("No valid current value data available")
-        else:
-            st.info("Current value information not available in portfolio data")
+                st.info("Current value information not available in portfolio data")
         
         # Market cap distribution (if available)
-        st.subheader("📊 Market Cap Distribution")
-        
-        # Check if we have market cap data
-        if hasattr(self.session_state, 'market_caps') and self.session_state.market_caps:
-            # Filter stocks (exclude mutual funds) and get their market caps
-            stock_data = df[~df['ticker'].astype(str).str.isdigit() & ~df['ticker'].str.startswith('MF_')].copy()
-            
-            if not stock_data.empty:
-                # Normalize ticker names by removing exchange suffixes and standardizing names
-                def normalize_ticker(ticker):
-                    """Normalize ticker by removing exchange suffixes and standardizing names"""
-                    if pd.isna(ticker):
-                        return ticker
-                    
-                    ticker_str = str(ticker).upper()
+        with st.expander("📊 Market Cap Distribution", expanded=False):
+            # Check if we have market cap data
+            if hasattr(self.session_state, 'market_caps') and self.session_state.market_caps:
+                # Market caps are collected into a dict while fetching; turned into a Series once
+                market_cap_lookup = self.get_derived_frame(
+                    'market_cap_lookup', lambda: pd.Series(self.session_state.market_caps, dtype='float32')
+                )
+                
+                # Filter stocks (exclude mutual funds) and get their market caps
+                def select_market_cap_stocks():
+                    # One string cast for both tests, and only the columns the breakdown uses are copied
+                    ticker_str = df['ticker'].astype(str)
+                    mask = ~ticker_str.str.isdigit() & ~ticker_str.str.startswith('MF_')
+                    stock_data = df.loc[mask, ['ticker', 'current_value', 'invested_amount', 'quantity']].copy()
                     
-                    # Remove exchange suffixes
-                    if ticker_str.endswith('.NS') or ticker_str.endswith('.BO'):
-                        ticker_str = ticker_str[:-3]
+                    # Normalize ticker names: upper case, without the exchange suffix
+                    stock_data['normalized_ticker'] = ticker_str[mask].str.upper().str.replace(
+                        EXCHANGE_SUFFIX_RE, '', regex=True
+                    )
                     
-                    # Handle common variations
-                    if ticker_str == 'RELIANCE':
-                        return 'RELIANCE'
-                    elif ticker_str == 'HDFCBANK':
-                        return 'HDFCBANK'
-                    elif ticker_str == 'BHARTIARTL':
-                        return 'BHARTIARTL'
-                    elif ticker_str == 'TCS':
-                        return 'TCS'
-                    elif ticker_str == 'ICICIBANK':
-                        return 'ICICIBANK'
-                    elif ticker_str == 'INFY':
-                        return 'INFY'
-                    elif ticker_str == 'SBIN':
-                        return 'SBIN'
-                    elif ticker_str == 'ITC':
-                        return 'ITC'
-                    elif ticker_str == 'LT':
-                        return 'LT'
-                    elif ticker_str == 'ASIANPAINT':
-                        return 'ASIANPAINT'
-                    elif ticker_str == 'MARUTI':
-                        return 'MARUTI'
-                    elif ticker_str == 'BAJFINANCE':
-                        return 'BAJFINANCE'
-                    elif ticker_str == 'HCLTECH':
-                        return 'HCLTECH'
-                    elif ticker_str == 'WIPRO':
-                        return 'WIPRO'
-                    elif ticker_str == 'TECHM':
-                        return 'TECHM'
-                    elif ticker_str == 'AXISBANK':
-                        return 'AXISBANK'
-                    elif ticker_str == 'KOTAKBANK':
-                        return 'KOTAKBANK'
-                    elif ticker_str == 'NESTLEIND':
-                        return 'NESTLEIND'
-                    elif ticker_str == 'SUNPHARMA':
-                        return 'SUNPHARMA'
-                    elif ticker_str == 'TITAN':
-                        return 'TITAN'
-                    elif ticker_str == 'ONGC':
-                        return 'ONGC'
-                    elif ticker_str == 'COALINDIA':
-                        return 'COALINDIA'
-                    elif ticker_str == 'DRREDDY':
-                        return 'DRREDDY'
-                    elif ticker_str == 'CIPLA':
-                        return 'CIPLA'
-                    elif ticker_str == 'POWERGRID':
-                        return 'POWERGRID'
-                    elif ticker_str == 'GRASIM':
-                        return 'GRASIM'
-                    elif ticker_str == 'JSWSTEEL':
-                        return 'JSWSTEEL'
-                    elif ticker_str == 'HINDZINC':
-                        return 'HINDZINC'
-                    elif ticker_str == 'TATAMOTORS':
-                        return 'TATAMOTORS'
-                    elif ticker_str == 'TATASTEEL':
-                        return 'TATASTEEL'
-                    elif ticker_str == 'BAJAJ-AUTO':
-                        return 'BAJAJ-AUTO'
-                    else:
-                        return ticker_str
-                
-                # Add normalized ticker column
-                stock_data['normalized_ticker'] = stock_data['ticker'].apply(normalize_ticker)
+                    # Add market cap data to stock data; mapping the plain strings through a
+                    # Series uses pandas' hashtable and keeps the result a float column
+                    stock_data['market_cap'] = ticker_str[mask].map(market_cap_lookup)
+                    return stock_data
                 
-                # Add market cap data to stock data
-                stock_data['market_cap'] = stock_data['ticker'].map(self.session_state.market_caps)
+                stock_data = self.get_derived_frame('market_cap_stocks', select_market_cap_stocks)
                 
-                # Filter stocks with market cap data
-                stocks_with_market_cap = stock_data.dropna(subset=['market_cap'])
-                
-                if not stocks_with_market_cap.empty:
-                    # Group by normalized ticker and aggregate data
-                    market_cap_grouped = stocks_with_market_cap.groupby('normalized_ticker').agg({
-                        'market_cap': 'first',  # Take first market cap value
-                        'current_value': 'sum',  # Sum current values for same stock
-                        'invested_amount': 'sum',  # Sum invested amounts for same stock
-                        'quantity': 'sum',  # Sum quantities for same stock
-                        'ticker': lambda x: ', '.join(x.unique())  # Show all ticker variations
-                    }).reset_index()
-                    
-                    # Categorize stocks by market cap (in Crores)
-                    def categorize_market_cap(market_cap):
-                        if market_cap >= 20000:  # 20,000 Cr and above
-                            return 'Large Cap (₹20,000+ Cr)'
-                        elif market_cap >= 5000:  # 5,000 - 19,999 Cr
-                            return 'Mid Cap (₹5,000-19,999 Cr)'
-                        elif market_cap >= 500:  # 500 - 4,999 Cr
-                            return 'Small Cap (₹500-4,999 Cr)'
-                        else:  # Below 500 Cr
-                            return 'Micro Cap (<₹500 Cr)'
-                    
-                    market_cap_grouped['market_cap_category'] = market_cap_grouped['market_cap'].apply(categorize_market_cap)
-                    
-                    # Group by market cap category and sum current values
-                    market_cap_distribution = market_cap_grouped.groupby('market_cap_category')['current_value'].sum().sort_values(ascending=False)
+                if not stock_data.empty:
+                    market_cap_grouped = self.get_derived_frame(
+                        'market_cap_grouped', lambda: build_market_cap_grouped(stock_data)
+                    )
                     
-                    if not market_cap_distribution.empty:
-                        # Create pie chart
-                        fig_market_cap = px.pie(
-                            values=market_cap_distribution.values,
-                            names=market_cap_distribution.index,
-                            title="Portfolio Distribution by Market Cap",
-                            color_discrete_sequence=px.colors.qualitative.Set3
+                    if not market_cap_grouped.empty:
+                        # Group by market cap category and sum current values
+                        market_cap_distribution = self.get_derived_frame(
+                            'market_cap_distribution',
+                            lambda: market_cap_grouped.groupby(
+                                'market_cap_category', sort=False, observed=True
+                            )['current_value'].sum()
                         )
-                        fig_market_cap.update_traces(textposition='inside', textinfo='percent+label')
-                        st.plotly_chart(fig_market_cap, width='stretch')
-                        
-                        # Show summary metrics
-                        col1, col2, col3, col4 = st.columns(4)
-                        
-                        with col1:
-                            large_cap_value = market_cap_distribution.get('Large Cap (₹20,000+ Cr)', 0)
-                            st.metric("Large Cap", f"₹{large_cap_value:,.0f}")
-                        
-                        with col2:
-                            mid_cap_value = market_cap_distribution.get('Mid Cap (₹5,000-19,999 Cr)', 0)
-                            st.metric("Mid Cap", f"₹{mid_cap_value:,.0f}")
-                        
-                        with col3:
-                            small_cap_value = market_cap_distribution.get('Small Cap (₹500-4,999 Cr)', 0)
-                            st.metric("Small Cap", f"₹{small_cap_value:,.0f}")
-                        
-                        with col4:
-                            micro_cap_value = market_cap_distribution.get('Micro Cap (<₹500 Cr)', 0)
-                            st.metric("Micro Cap", f"₹{micro_cap_value:,.0f}")
-                        
-                        # Show detailed breakdown
-                        st.subheader("📋 Market Cap Breakdown by Stock")
-                        
-                        # Format the display
-                        market_cap_breakdown_display = market_cap_grouped[['normalized_ticker', 'market_cap', 'market_cap_category', 'current_value', 'invested_amount', 'quantity', 'ticker']].copy()
-                        market_cap_breakdown_display['market_cap_cr'] = market_cap_breakdown_display['market_cap'] / 100  # Convert to Crores
-                        market_cap_breakdown_display = market_cap_breakdown_display.sort_values('market_cap', ascending=False)
-                        
-                        # Rename columns for display
-                        market_cap_breakdown_display.columns = ['Stock Name', 'Market Cap', 'Category', 'Portfolio Value', 'Invested Amount', 'Total Quantity', 'Ticker Variations', 'Market Cap (Cr)']
-                        
-                        # Format the display columns
-                        display_df = market_cap_breakdown_display[['Stock Name', 'Market Cap (Cr)', 'Category', 'Portfolio Value', 'Invested Amount', 'Total Quantity', 'Ticker Variations']].copy()
-                        display_df['Market Cap (Cr)'] = display_df['Market Cap (Cr)'].apply(lambda x: f"₹{x:,.0f}")
-                        display_df['Portfolio Value'] = display_df['Portfolio Value'].apply(lambda x: f"₹{x:,.0f}")
-                        display_df['Invested Amount'] = display_df['Invested Amount'].apply(lambda x: f"₹{x:,.0f}")
-                        display_df['Total Quantity'] = display_df['Total Quantity'].apply(lambda x: f"{x:,.0f}")
-                        
-                        st.dataframe(display_df, width='stretch')
                         
+                        if not market_cap_distribution.empty:
+                            # Create pie chart
+                            fig_market_cap = px.pie(
+                                values=market_cap_distribution.values,
+                                names=market_cap_distribution.index,
+                                title="Portfolio Distribution by Market Cap",
+                                color_discrete_sequence=px.colors.qualitative.Set3
+                            )
+                            fig_market_cap.update_traces(textposition='inside', textinfo='percent+label')
+                            st.plotly_chart(fig_market_cap, width='stretch')
+                            
+                            # Show summary metrics, one per category that holds any value
+                            cap_metrics = [
+                                (label, market_cap_distribution.get(category, 0))
+                                for label, category in MARKET_CAP_METRICS
+                            ]
+                            cap_metrics = [(label, value) for label, value in cap_metrics if value]
+                            if cap_metrics:
+                                for col, (label, value) in zip(st.columns(len(cap_metrics)), cap_metrics):
+                                    col.metric(label, f"₹{value:,.0f}")
+                            
+                            # Show detailed breakdown
+                            st.subheader("📋 Market Cap Breakdown by Stock")
+                            
+                            # Built straight from the already sorted market_cap_grouped; columns stay
+                            # numeric so they sort correctly, the Styler formats them at render time
+                            display_df = pd.DataFrame({
+                                'Stock Name': market_cap_grouped['normalized_ticker'],
+                                'Market Cap (Cr)': market_cap_grouped['market_cap'] / 100,  # Convert to Crores
+                                'Category': market_cap_grouped['market_cap_category'],
+                                'Portfolio Value': market_cap_grouped['current_value'],
+                                'Invested Amount': market_cap_grouped['invested_amount'],
+                                'Total Quantity': market_cap_grouped['quantity'],
+                                'Ticker Variations': market_cap_grouped['ticker']
+                            })
+                            
+                            st.dataframe(display_df.style.format(MARKET_CAP_FORMATS), width='stretch')
+                            
+                        else:
+                            st.info("No market cap distribution data available")
                     else:
-                        st.info("No market cap distribution data available")
+                        st.info("No stocks with market cap data found")
                 else:
-                    st.info("No stocks with market cap data found")
+                    st.info("No stock data available for market cap analysis")
             else:
-                st.info("No stock data available for market cap analysis")
-        else:
-            st.info("Market cap data not available. Run 'Fetch Live Prices' to get market cap information.")
+                st.info("Market cap data not available. Run 'Fetch Live Prices' to get market cap information.")
     
     def render_pnl_analysis_page(self):
         """Render P&L analysis"""
+        import plotly.express as px
         st.header("💰 P&L Analysis")
         
         if self.session_state.portfolio_data is None:
@@ -2719,199 +3023,177 @@ class PortfolioAnalytics:
         # P&L summary by ticker
         st.subheader("📊 P&L Summary by Ticker")
         
-        pnl_summary = df.groupby('ticker').agg({
-            'invested_amount': 'sum',
-            'current_value': 'sum',
-            'unrealized_pnl': 'sum',
-            'pnl_percentage': 'mean'
-        }).reset_index()
+        # One pass over the portfolio at (ticker, sector, channel) grain; every table
+        # and chart below is a rollup of this small frame
+        pnl = self.get_derived_frame('pnl_rollups', lambda: build_pnl_rollups(df))
+        pnl_summary = pnl['summary']
         
-        pnl_summary['status'] = pnl_summary['unrealized_pnl'].apply(
-            lambda x: 'Profit' if x > 0 else 'Loss' if x < 0 else 'Break Even'
+        # Only the plotted columns go to the browser, rounded to paise and as float32
+        pnl_scatter = self.get_derived_frame(
+            'pnl_scatter',
+            lambda: pnl_summary[PNL_SCATTER_COLUMNS].round(2).astype(
+                {col: 'float32' for col in PNL_SCATTER_COLUMNS if col not in ('ticker', 'status')}
+            )
         )
         
         # Color code the P&L
-        fig_pnl = px.scatter(
-            pnl_summary,
-            x='invested_amount',
-            y='unrealized_pnl',
-            size='current_value',
-            color='status',
-            hover_data=['ticker', 'pnl_percentage'],
-            title="P&L vs Investment Amount",
-            labels={
-                'invested_amount': 'Invested Amount (₹)',
-                'unrealized_pnl': 'Unrealized P&L (₹)',
-                'current_value': 'Current Value (₹)'
-            }
-        )
+        # Built once per portfolio version; the stable key and uirevision let reruns
+        # reuse the chart component instead of recreating it
+        def build_pnl_scatter_figure():
+            fig = px.scatter(
+                pnl_scatter,
+                x='invested_amount',
+                y='unrealized_pnl',
+                size='current_value',
+                color='status',
+                hover_data=['ticker', 'pnl_percentage'],
+                render_mode='webgl' if len(pnl_scatter) > WEBGL_MIN_POINTS else 'svg',
+                title="P&L vs Investment Amount",
+                labels={
+                    'invested_amount': 'Invested Amount (₹)',
+                    'unrealized_pnl': 'Unrealized P&L (₹)',
+                    'current_value': 'Current Value (₹)'
+                }
+            )
+            fig.update_layout(uirevision='pnl_scatter')
+            return fig
         
-        st.plotly_chart(fig_pnl, width='stretch')
+        fig_pnl = self.get_derived_frame('pnl_scatter_figure', build_pnl_scatter_figure)
+        st.plotly_chart(fig_pnl, width='stretch', key='pnl_scatter')
         
 
         
         # P&L by Sector and Channel
         st.subheader("🏦 P&L by Sector & Channel")
         
-        # Ensure sector and channel information is available
-        if 'sector' not in df.columns or df['sector'].isna().all():
-            # Get sectors from live prices data
-            sectors = self.session_state.sectors if hasattr(self.session_state, 'sectors') else {}
-            df['sector'] = df['ticker'].map(sectors).fillna('Unknown')
-        
-        if 'channel' not in df.columns or df['channel'].isna().all():
-            # Try to get channel from file records if available
-            try:
-                user_id = self.session_state.user_id
-                file_records = get_file_records_supabase(user_id)
-                
-                if file_records:
-                    # Create a mapping of ticker to channel based on file records
-                    ticker_to_channel = {}
-                    for record in file_records:
-                        if 'filename' in record and 'channel' in record:
-                            channel_name = record['channel'] if record['channel'] else record['filename'].replace('.csv', '').replace('_', ' ')
-                            # Get transactions for this file and map tickers to channel
-                            file_transactions = get_transactions_supabase(user_id=user_id, file_id=record.get('id'))
-                            if file_transactions:
-                                for trans in file_transactions:
-                                    ticker_to_channel[trans['ticker']] = channel_name
-                    
-                    # Add channel information to dataframe
-                    df['channel'] = df['ticker'].map(ticker_to_channel).fillna('Unknown')
-            except Exception as e:
-                st.warning(f"Could not fetch channel information: {e}")
-                df['channel'] = 'Unknown'
-        
-        # P&L by Sector
-        st.subheader("🏭 P&L by Sector")
-        pnl_by_sector = df.groupby('sector')['unrealized_pnl'].sum().reset_index()
-        pnl_by_sector = pnl_by_sector.sort_values('unrealized_pnl', ascending=False)
-        
+        # P&L by Sector, by Channel and combined
+        pnl_by_sector = pnl['by_sector']
+        pnl_by_channel = pnl['by_channel']
+        combined_pnl = pnl['combined']
+        
+        # Each section is a fragment, so interacting with one reruns only that block.
+        # They sit below the scatter and start collapsed, so their charts are only
+        # laid out in the browser once opened
+        with st.expander("🏭 P&L by Sector", expanded=False):
+            self._render_pnl_by_sector(pnl_by_sector)
+        with st.expander("📊 P&L by Channel", expanded=False):
+            self._render_pnl_by_channel(pnl_by_channel)
+        with st.expander("🔗 Combined Sector-Channel P&L Analysis", expanded=False):
+            self._render_combined_sector_channel(combined_pnl)
+        with st.expander("📋 Detailed P&L Table", expanded=False):
+            self._render_pnl_table(pnl_summary)
+    
+    @fragment
+    def _render_pnl_by_sector(self, pnl_by_sector):
+        """Render the P&L by sector chart and best/worst metrics as a fragment"""
+        import plotly.express as px
         if not pnl_by_sector.empty:
-            fig_sector_pnl = px.bar(
-                pnl_by_sector,
-                x='sector',
-                y='unrealized_pnl',
-                title="P&L by Sector",
-                labels={'sector': 'Sector', 'unrealized_pnl': 'Total P&L (₹)'},
-                color='unrealized_pnl',
-                color_continuous_scale='RdYlGn'
-            )
-            fig_sector_pnl.update_xaxes(tickangle=45)
-            st.plotly_chart(fig_sector_pnl, width='stretch')
+            # Long tails are bucketed so the chart stays readable and small
+            def build_pnl_by_sector_figure():
+                fig = px.bar(
+                    top_categories(pnl_by_sector, 'sector', 'unrealized_pnl'),
+                    x='sector',
+                    y='unrealized_pnl',
+                    title="P&L by Sector",
+                    labels={'sector': 'Sector', 'unrealized_pnl': 'Total P&L (₹)'},
+                    color='unrealized_pnl',
+                    color_continuous_scale='RdYlGn'
+                )
+                fig.update_xaxes(tickangle=45)
+                fig.update_layout(uirevision='pnl_by_sector')
+                return fig
+            
+            fig_sector_pnl = self.get_derived_frame('pnl_by_sector_figure', build_pnl_by_sector_figure)
+            st.plotly_chart(fig_sector_pnl, width='stretch', key='pnl_by_sector')
             
             # Sector P&L summary
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                best_sector = pnl_by_sector.loc[pnl_by_sector['unrealized_pnl'].idxmax()]
-                best_pnl = best_sector['unrealized_pnl']
-                best_arrow = "🔼" if best_pnl > 0 else "🔽" if best_pnl < 0 else "➖"
-                best_color = "normal" if best_pnl > 0 else "inverse"
-                st.metric(
-                    "Best Sector", 
-                    f"{best_arrow} {best_sector['sector']}", 
-                    delta=f"₹{best_pnl:,.2f}",
-                    delta_color=best_color
-                )
-            with col2:
-                worst_sector = pnl_by_sector.loc[pnl_by_sector['unrealized_pnl'].idxmin()]
-                worst_pnl = worst_sector['unrealized_pnl']
-                worst_arrow = "🔼" if worst_pnl > 0 else "🔽" if worst_pnl < 0 else "➖"
-                worst_color = "normal" if worst_pnl > 0 else "inverse"
-                st.metric(
-                    "Worst Sector", 
-                    f"{worst_arrow} {worst_sector['sector']}", 
-                    delta=f"₹{worst_pnl:,.2f}",
-                    delta_color=worst_color
-                )
-            with col3:
-                total_sectors = len(pnl_by_sector)
-                st.metric("Total Sectors", total_sectors)
+            self._render_best_worst_metrics(pnl_by_sector, 'sector', 'Sector')
         else:
             st.info("No sector data available for P&L analysis")
-        
-        # P&L by Channel
-        st.subheader("📊 P&L by Channel")
-        pnl_by_channel = df.groupby('channel')['unrealized_pnl'].sum().reset_index()
-        pnl_by_channel = pnl_by_channel.sort_values('unrealized_pnl', ascending=False)
-        
+    
+    @fragment
+    def _render_pnl_by_channel(self, pnl_by_channel):
+        """Render the P&L by channel chart and best/worst metrics as a fragment"""
+        import plotly.express as px
         if not pnl_by_channel.empty:
-            fig_channel_pnl = px.bar(
-                pnl_by_channel,
-                x='channel',
-                y='unrealized_pnl',
-                title="P&L by Investment Channel",
-                labels={'channel': 'Channel', 'unrealized_pnl': 'Total P&L (₹)'},
-                color='unrealized_pnl',
-                color_continuous_scale='RdYlGn'
-            )
-            fig_channel_pnl.update_xaxes(tickangle=45)
-            st.plotly_chart(fig_channel_pnl, width='stretch')
+            # Long tails are bucketed so the chart stays readable and small
+            def build_pnl_by_channel_figure():
+                fig = px.bar(
+                    top_categories(pnl_by_channel, 'channel', 'unrealized_pnl'),
+                    x='channel',
+                    y='unrealized_pnl',
+                    title="P&L by Investment Channel",
+                    labels={'channel': 'Channel', 'unrealized_pnl': 'Total P&L (₹)'},
+                    color='unrealized_pnl',
+                    color_continuous_scale='RdYlGn'
+                )
+                fig.update_xaxes(tickangle=45)
+                fig.update_layout(uirevision='pnl_by_channel')
+                return fig
+            
+            fig_channel_pnl = self.get_derived_frame('pnl_by_channel_figure', build_pnl_by_channel_figure)
+            st.plotly_chart(fig_channel_pnl, width='stretch', key='pnl_by_channel')
             
             # Channel P&L summary
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                best_channel = pnl_by_channel.loc[pnl_by_channel['unrealized_pnl'].idxmax()]
-                best_pnl = best_channel['unrealized_pnl']
-                best_arrow = "🔼" if best_pnl > 0 else "🔽" if best_pnl < 0 else "➖"
-                best_color = "normal" if best_pnl > 0 else "inverse"
-                st.metric(
-                    "Best Channel", 
-                    f"{best_arrow} {best_channel['channel']}", 
-                    delta=f"₹{best_pnl:,.2f}",
-                    delta_color=best_color
-                )
-            with col2:
-                worst_channel = pnl_by_channel.loc[pnl_by_channel['unrealized_pnl'].idxmin()]
-                worst_pnl = worst_channel['unrealized_pnl']
-                worst_arrow = "🔼" if worst_pnl > 0 else "🔽" if worst_pnl < 0 else "➖"
-                worst_color = "normal" if worst_pnl > 0 else "inverse"
-                st.metric(
-                    "Worst Channel", 
-                    f"{worst_arrow} {worst_channel['channel']}", 
-                    delta=f"₹{worst_pnl:,.2f}",
-                    delta_color=worst_color
-                )
-            with col3:
-                total_channels = len(pnl_by_channel)
-                st.metric("Total Channels", total_channels)
+            self._render_best_worst_metrics(pnl_by_channel, 'channel', 'Channel')
         else:
             st.info("No channel data available for P&L analysis")
-        
-        # Combined Sector-Channel P&L Analysis
-        st.subheader("🔗 Combined Sector-Channel P&L Analysis")
-        combined_pnl = df.groupby(['sector', 'channel'])['unrealized_pnl'].sum().reset_index()
-        combined_pnl = combined_pnl.sort_values('unrealized_pnl', ascending=False)
-        
+    
+    def _render_best_worst_metrics(self, pnl_by_group, key, label):
+        """Render best/worst/total metrics for a P&L rollup sorted by P&L descending"""
+        metrics = []
+        for title, row in ((f"Best {label}", pnl_by_group.iloc[0]), (f"Worst {label}", pnl_by_group.iloc[-1])):
+            pnl = row['unrealized_pnl']
+            arrow = "🔼" if pnl > 0 else "🔽" if pnl < 0 else "➖"
+            metrics.append((title, f"{arrow} {row[key]}", {
+                'delta': f"₹{pnl:,.2f}",
+                'delta_color': "normal" if pnl > 0 else "inverse"
+            }))
+        metrics.append((f"Total {label}s", len(pnl_by_group), {}))
+        
+        for col, (title, value, extra) in zip(st.columns(len(metrics)), metrics):
+            col.metric(title, value, **extra)
+    
+    @fragment
+    def _render_combined_sector_channel(self, combined_pnl):
+        """Render the combined sector-channel P&L chart and table as a fragment"""
+        import plotly.express as px
         if not combined_pnl.empty:
             # Create a heatmap-like visualization
-            fig_combined = px.bar(
-                combined_pnl,
-                x='sector',
-                y='unrealized_pnl',
-                color='channel',
-                title="P&L by Sector and Channel Combination",
-                labels={'sector': 'Sector', 'unrealized_pnl': 'Total P&L (₹)', 'channel': 'Channel'},
-                barmode='group'
-            )
-            fig_combined.update_xaxes(tickangle=45)
-            st.plotly_chart(fig_combined, width='stretch')
+            def build_pnl_combined_figure():
+                fig = px.bar(
+                    combined_pnl,
+                    x='sector',
+                    y='unrealized_pnl',
+                    color='channel',
+                    title="P&L by Sector and Channel Combination",
+                    labels={'sector': 'Sector', 'unrealized_pnl': 'Total P&L (₹)', 'channel': 'Channel'},
+                    barmode='group'
+                )
+                fig.update_xaxes(tickangle=45)
+                fig.update_layout(uirevision='pnl_combined')
+                return fig
+            
+            fig_combined = self.get_derived_frame('pnl_combined_figure', build_pnl_combined_figure)
+            st.plotly_chart(fig_combined, width='stretch', key='pnl_combined')
             
-            # Combined summary table
-            combined_pnl['pnl_formatted'] = combined_pnl['unrealized_pnl'].apply(lambda x: f"₹{x:,.2f}")
-            combined_pnl['percentage'] = (combined_pnl['unrealized_pnl'] / combined_pnl['unrealized_pnl'].abs().sum() * 100).apply(lambda x: f"{x:.2f}%")
+            # Combined summary table, numeric and formatted by the Styler; the
+            # percentage goes on a copy so the cached frame is left as is
+            combined_table = combined_pnl[['sector', 'channel', 'unrealized_pnl']].copy()
+            combined_table['percentage'] = combined_table['unrealized_pnl'] / combined_table['unrealized_pnl'].abs().sum() * 100
             
             st.dataframe(
-                combined_pnl[['sector', 'channel', 'pnl_formatted', 'percentage']],
+                combined_table.style.format(COMBINED_PNL_FORMATS),
                 width='stretch',
-                hide_index=True
+                hide_index=True,
+                column_config=COMBINED_PNL_COLUMN_CONFIG
             )
         else:
             st.info("No combined sector-channel data available for P&L analysis")
-        
-        # Detailed P&L table
-        st.subheader("📋 Detailed P&L Table")
+    
+    @fragment
+    def _render_pnl_table(self, pnl_summary):
+        """Render the detailed P&L table as a fragment"""
         st.dataframe(
             pnl_summary.sort_values('unrealized_pnl', ascending=False),
             width='stretch'
@@ -2921,7 +3203,9 @@ class PortfolioAnalytics:
         """Render file management page"""
         st.header("📁 File Management")
         
-        user_id = self.session_state.user_id
+        # One proxy lookup per rerun, reused by the whole page
+        ss = self.session_state
+        user_id = ss.user_id
         if not user_id:
             st.error("No user ID found")
             return
@@ -2930,10 +3214,10 @@ class PortfolioAnalytics:
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("📋 View Sample CSV Format", type="secondary", use_container_width=True):
-                st.session_state.show_sample_csv_files = True
+                ss.show_sample_csv_files = True
         
         # Show sample CSV format in a prominent popup-style display
-        if st.session_state.get('show_sample_csv_files', False):
+        if ss.get('show_sample_csv_files', False):
             st.markdown("---")
             st.subheader("📋 Sample CSV Format")
             st.success("💡 **Prepare your CSV file with the following format:**")
@@ -2979,26 +3263,14 @@ class PortfolioAnalytics:
             col1, col2, col3 = st.columns([1, 1, 1])
             with col1:
                 if st.button("✖️ Close Sample Format", type="secondary", key="close_files_sample"):
-                    st.session_state.show_sample_csv_files = False
+                    ss.show_sample_csv_files = False
                     st.rerun()
             
             with col2:
-                # Create and download sample CSV
-                sample_data = {
-                    'date': ['2024-01-15', '2024-01-20', '2024-02-01'],
-                    'ticker': ['RELIANCE', '120828', 'TCS'],
-                    'quantity': [100, 500, 50],
-                    'transaction_type': ['buy', 'buy', 'sell'],
-                    'price': [2500.50, 45.25, 3800.00],
-                    'stock_name': ['Reliance Industries', 'ICICI Prudential Technology Fund', 'Tata Consultancy Services'],
-                    'sector': ['Oil & Gas', 'Technology', 'Technology'],
-                    'channel': ['Direct', 'Online', 'Broker']
-                }
-                sample_df = pd.DataFrame(sample_data)
-                csv = sample_df.to_csv(index=False)
+                # Download the sample CSV
                 st.download_button(
                     label="📥 Download Sample CSV",
-                    data=csv,
+                    data=SAMPLE_CSV,
                     file_name="sample_investment_portfolio.csv",
                     mime="text/csv",
                     type="primary",
@@ -3049,67 +3321,48 @@ class PortfolioAnalytics:
             if st.button("Process File"):
                 with st.spinner("Processing file..."):
                     try:
-                        st.info(f"🔄 Files page: Starting to process file: {uploaded_file.name}")
                         # Process the uploaded file using the local method
                         result = self.process_csv_file(uploaded_file, user_id)
-                        st.info(f"🔄 Files page: process_csv_file returned: {result}")
+                        debug_info("🔄 Files page: processed %s, result %s", uploaded_file.name, result)
                         
                         if result:
                             st.success("File processed successfully!")
-                            st.info("🔄 Files page: File processed successfully, refreshing portfolio data...")
                             # Refresh portfolio data
                             self.load_portfolio_data(user_id)
-                            st.info("🔄 Files page: Portfolio data refreshed, calling rerun...")
                             st.rerun()  # Refresh the page to show updated data
                         else:
                             st.error("Error processing file")
-                            st.error("❌ Files page: File processing returned False")
                     except Exception as e:
+                        logger.exception("Files page file processing failed")
                         st.error(f"Error processing file: {e}")
-                        st.error(f"Error details: {str(e)}")
-                        st.error(f"❌ Files page: File processing error: {e}")
-                        st.error(f"Error type: {type(e).__name__}")
-                        import traceback
-                        st.error(f"Traceback: {traceback.format_exc()}")
-                        st.error(f"Traceback: {traceback.format_exc()}")
         
         # File history
+        self._render_file_history(user_id)
+    
+    @fragment
+    def _render_file_history(self, user_id):
+        """Render the file history table and counts as a fragment, apart from the upload widgets"""
         st.subheader("📋 File History")
         
         try:
-            files = get_file_records_supabase(user_id=user_id)
-            if files:
-                files_df = pd.DataFrame(files)
-                
-                # Show available columns for debugging
-                st.info(f"Available columns: {list(files_df.columns)}")
-                
-                # Select display columns based on available data
-                display_columns = ['filename']
-                if 'customer_name' in files_df.columns:
-                    display_columns.append('customer_name')
-                if 'processed_at' in files_df.columns:
-                    display_columns.append('processed_at')
-                if 'status' in files_df.columns:
-                    display_columns.append('status')
-                if 'file_path' in files_df.columns:
-                    display_columns.append('file_path')
+            # Only the display columns, projected once per fetch of the file records
+            history, counts = cached_file_history(user_id)
+            if history['filename']:
+                files_df = pd.DataFrame(history)
                 
                 # Display file records with available columns
-                st.dataframe(files_df[display_columns], width='stretch')
+                st.dataframe(files_df, width='stretch')
                 
                 # Show file summary
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Total Files", len(files_df))
+                    st.metric("Total Files", counts['total'])
                 with col2:
-                    if 'status' in files_df.columns:
-                        processed_count = len(files_df[files_df['status'] == 'processed'])
-                        st.metric("Processed Files", processed_count)
+                    if 'status' in history:
+                        st.metric("Processed Files", counts['processed'])
                 with col3:
-                    if 'processed_at' in files_df.columns:
-                        recent_files = len(files_df[files_df['processed_at'].notna()])
-                        st.metric("Recent Files", recent_files)
+                    if 'processed_at' in history:
+                        st.metric("Recent Files", counts['recent'])
                 
             else:
                 st.info("No files uploaded yet")
@@ -3122,7 +3375,9 @@ class PortfolioAnalytics:
         """Render settings page"""
         st.header("⚙️ Settings")
         
-        user_id = self.session_state.user_id
+        # One proxy lookup per rerun, reused by the whole page
+        ss = self.session_state
+        user_id = ss.user_id
         if not user_id:
             st.error("No user ID found")
             return
@@ -3132,13 +3387,14 @@ class PortfolioAnalytics:
         col1, col2 = st.columns(2)
         
         with col1:
-            st.write(f"**Username:** {self.session_state.username}")
+            st.write(f"**Username:** {ss.username}")
             st.write(f"**User ID:** {user_id}")
-            st.write(f"**Role:** {self.session_state.user_role}")
+            st.write(f"**Role:** {ss.user_role}")
             
             with col2:
-                st.write(f"**Login Time:** {self.session_state.login_time.strftime('%Y-%m-%d %H:%M:%S')}")
-                st.write(f"**Session Duration:** {(datetime.now() - self.session_state.login_time).total_seconds() / 3600:.1f} hours")
+                login_time = ss.login_time
+                st.write(f"**Login Time:** {login_time.strftime('%Y-%m-%d %H:%M:%S')}")
+                st.write(f"**Session Duration:** {session_duration_hours(login_time.isoformat())} hours")
         
         st.markdown("---")
         
@@ -3151,6 +3407,9 @@ class PortfolioAnalytics:
             if st.button("🔄 Refresh Portfolio Data"):
                 with st.spinner("Refreshing data..."):
                     try:
+                        # An explicit refresh always goes back to Supabase
+                        clear_user_data_caches()
+                        
                         # First fetch live prices and sectors
                         self.fetch_live_prices_and_sectors(user_id)
                         st.success("Live prices updated!")
@@ -3172,8 +3431,9 @@ class PortfolioAnalytics:
         
         with col3:
             if st.button("🧹 Clear Cache"):
-                if 'live_prices' in self.session_state:
-                    del self.session_state['live_prices']
+                if 'live_prices' in ss:
+                    del ss['live_prices']
+                clear_user_data_caches()
                 st.success("Cache cleared!")
         
         # Debug section
@@ -3185,19 +3445,19 @@ class PortfolioAnalytics:
                 st.info("Testing basic functions...")
                 
                 # Test 1: Check session state
-                st.write(f"✅ Session state: user_id={self.session_state.user_id}, username={self.session_state.username}")
+                st.write(f"✅ Session state: user_id={ss.user_id}, username={ss.username}")
                 
                 # Test 2: Test database connection
                 try:
-                    files = get_file_records_supabase(user_id=self.session_state.user_id)
+                    files = get_file_records_supabase(user_id=ss.user_id)
                     st.write(f"✅ Database connection: Found {len(files) if files else 0} files")
                 except Exception as e:
                     st.error(f"❌ Database connection failed: {e}")
                 
                 # Test 3: Test portfolio data loading
                 try:
-                    self.load_portfolio_data(self.session_state.user_id)
-                    portfolio_count = len(self.session_state.portfolio_data) if self.session_state.portfolio_data is not None else 0
+                    self.load_portfolio_data(ss.user_id)
+                    portfolio_count = len(ss.portfolio_data) if ss.portfolio_data is not None else 0
                     st.write(f"✅ Portfolio data loading: {portfolio_count} transactions")
                 except Exception as e:
                     st.error(f"❌ Portfolio data loading failed: {e}")
@@ -3205,9 +3465,8 @@ class PortfolioAnalytics:
                 st.success("✅ Basic function tests completed!")
                 
             except Exception as e:
+                logger.exception("Basic function tests failed")
                 st.error(f"❌ Test failed: {e}")
-                import traceback
-                st.error(f"Traceback: {traceback.format_exc()}")
         
         st.markdown("---")
         